@@ -1,18 +1,83 @@
-﻿from flask import Flask, render_template, request, jsonify
+﻿from flask import Flask, Response, g, render_template, request, jsonify
 import os
 import json
 import csv
+import asyncio
+import bisect
+import concurrent.futures
+import copy
+import gzip
+import hashlib
+import hmac
+import io
+import itertools
+import math
+import mmap
+import queue
+import random
+import re
+import struct
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from html.parser import HTMLParser
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 app.config['PROPAGATE_EXCEPTIONS'] = True
 
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    MODEL = "gpt-4.1-mini-2025-04-14"
-except Exception as e:
-    client = None
-    print(f"OpenAI initialization error: {e}")
+MODEL = "gpt-4.1-mini-2025-04-14"
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "16"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "120"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+
+# The openai package pulls in httpx and pydantic, about half a second of imports,
+# so the client is built on first use instead of at import: cold starts that only
+# serve pages or talk data never pay for it. `python scripts/measure_startup.py`
+# shows the breakdown.
+_CLIENT = None
+_CLIENT_ERROR = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client():
+    # The shared AsyncOpenAI client, or None when it cannot be configured.
+    global _CLIENT, _CLIENT_ERROR
+    if _CLIENT is None and _CLIENT_ERROR is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None and _CLIENT_ERROR is None:
+                try:
+                    import httpx
+                    from openai import AsyncOpenAI
+                    # One pooled transport for every upstream call, sized to the concurrency cap.
+                    # Retries are done by the dispatcher, so every 429 reaches its adaptive limit.
+                    _CLIENT = AsyncOpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        max_retries=0,
+                        http_client=httpx.AsyncClient(
+                            limits=httpx.Limits(max_connections=UPSTREAM_CONCURRENCY, max_keepalive_connections=UPSTREAM_CONCURRENCY),
+                            timeout=UPSTREAM_TIMEOUT
+                        )
+                    )
+                except Exception as e:
+                    _CLIENT_ERROR = e
+                    print(f"OpenAI initialization error: {e}")
+    return _CLIENT
+
+def client_configured() -> bool:
+    # Answers without importing openai when the client has not been built yet.
+    if _CLIENT is None and _CLIENT_ERROR is None:
+        return bool(os.getenv("OPENAI_API_KEY"))
+    return _CLIENT is not None
 
 # BASE PROMPTS
 BASE_PROMPT_SCRIPTURE = """You are a respectful, non-preachy scripture study guide.
@@ -108,6 +173,27 @@ Guidelines:
 - Help readers understand both WHAT and WHY"""
 
 
+BASE_PROMPT_STUDY_PLAN = """You are an experienced gospel teacher planning a series of lessons.
+Task: Turn short summaries of the chapters or topics in a reading plan into one plan a teacher can follow.
+
+Return JSON in this exact shape:
+{
+  "title": string,
+  "overview": string,
+  "arc": string,
+  "sessions": string[],
+  "themes": string[],
+  "discussion_questions": string[],
+  "activities": string[]
+}
+
+Guidelines:
+- Work from the unit summaries provided; do not restate them at length.
+- "overview" introduces the whole plan; "arc" explains how the units build on each other.
+- Give exactly one "sessions" entry per session listed, in order, with its teaching focus.
+- Prefer themes that run through several units over themes found in only one.
+- Keep a warm, invitational tone."""
+
 # GOSPEL ESSENTIALS
 GOSPEL_ESSENTIALS = [
     {"topic": "The Godhead", "subtopics": ["God the Father", "Jesus Christ the Son", "The Holy Ghost", "Their unity of purpose"]},
@@ -143,6 +229,14 @@ DEEP_DOCTRINE = [
     {"topic": "Prophecy and Future Revelation", "subtopics": ["Restoration of all things (Acts 3:21)", "Sealed books and records to come", "Ten Tribes return", "Future roles of translated beings", "Millennium governance under Christ"]}
 ]
 
+SUMMARY_LENGTHS = ("brief", "standard", "deep")
+
+def summary_length(value) -> str:
+    # The single length every later step sees (prompt guidance, token cap, cache key);
+    # anything unrecognized falls back to standard.
+    value = value.strip().lower() if isinstance(value, str) else ''
+    return value if value in SUMMARY_LENGTHS else 'standard'
+
 def length_guidance(length: str) -> str:
     if length == "brief":
         return "CRITICAL: Keep responses VERY concise. Overview and context: 1-2 sentences each. Summary: 2-3 sentences max. Lists: 2-3 items each."
@@ -222,21 +316,1952 @@ CANONS = [
     }
 ]
 
-TALKS = []
+# TALK STORE
+# Talks are held column-wise instead of as one dict per row. Low-cardinality
+# columns (speaker, month, year, session) are dictionary-encoded: an interned
+# value table plus an array of small integer codes. Rows are materialized as
+# dicts only when a response needs them.
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+TALKS_CSV_PATH = os.getenv("TALKS_CSV_PATH", os.path.join(DATA_DIR, 'talks.csv'))
+TALKS_SNAPSHOT_PATH = os.getenv("TALKS_SNAPSHOT_PATH", os.path.join(DATA_DIR, 'talks.snapshot'))
+TALK_COLUMNS = ("title", "speaker", "month", "year", "session", "url", "tags", "excerpt")
+DICT_COLUMNS = ("speaker", "month", "year", "session")
+SNAPSHOT_MAGIC = b"LTWTALK1"
 
-def load_talks():
-    global TALKS
+class DictColumn:
+    __slots__ = ("values", "codes", "lookup")
+
+    def __init__(self, values=None, codes=None):
+        self.values = values if values is not None else []
+        self.codes = codes if codes is not None else array('I')
+        self.lookup = {v: i for i, v in enumerate(self.values)}
+
+    def append(self, value: str):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value)
+            self.values.append(value)
+            self.lookup[value] = code
+        self.codes.append(code)
+
+    def __getitem__(self, row_id):
+        return self.values[self.codes[row_id]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def tolist(self) -> list:
+        values = self.values
+        return [values[c] for c in self.codes]
+
+class TalkStore:
+    __slots__ = ("columns", "count")
+
+    def __init__(self, columns=None):
+        self.columns = columns or {
+            name: DictColumn() if name in DICT_COLUMNS else [] for name in TALK_COLUMNS
+        }
+        self.count = len(self.columns["title"])
+
+    def __len__(self):
+        return self.count
+
+    def append(self, talk: dict):
+        for name in TALK_COLUMNS:
+            self.columns[name].append(talk.get(name) or '')
+        self.count += 1
+
+    def column(self, name: str) -> list:
+        col = self.columns[name]
+        col = col.tolist() if isinstance(col, DictColumn) else col
+        return col if len(col) == self.count else col[:self.count]
+
+    def extended(self, talks: list):
+        # A new version with `talks` appended. Columns are append-only and shared, so
+        # this store keeps seeing exactly its own `count` rows while the new one sees
+        # them all; only the newest version may be extended.
+        if len(self.columns["title"]) != self.count:
+            raise ValueError("talk store has already been extended")
+        store = TalkStore(self.columns)
+        for talk in talks:
+            store.append(talk)
+        return store
+
+    def row(self, row_id: int) -> dict:
+        return {name: self.columns[name][row_id] for name in TALK_COLUMNS}
+
+    def rows(self, row_ids) -> list:
+        return [self.row(i) for i in row_ids]
+
+    @classmethod
+    def from_csv(cls, path: str):
+        store = cls()
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for talk in csv.DictReader(f):
+                store.append(talk)
+        return store
+
+    def write_snapshot(self, path: str, source_digest: str):
+        # Layout: magic, u32 header length, JSON header, then one block per column.
+        # String blocks are NUL-joined UTF-8; dictionary columns add a code array.
+        blocks = []
+        header = {"count": self.count, "source_sha256": source_digest, "columns": {}}
+        offset = 0
+        def add(data: bytes):
+            nonlocal offset
+            blocks.append(data)
+            start, offset = offset, offset + len(data)
+            return [start, len(data)]
+        for name in TALK_COLUMNS:
+            col = self.columns[name]
+            if isinstance(col, DictColumn):
+                header["columns"][name] = {
+                    "values": add('\0'.join(col.values).encode('utf-8')),
+                    "codes": add(col.codes.tobytes()),
+                    "typecode": col.codes.typecode,
+                }
+            else:
+                header["columns"][name] = {"strings": add('\0'.join(col).encode('utf-8'))}
+        header_bytes = json.dumps(header).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            for block in blocks:
+                f.write(block)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_snapshot(cls, path: str, source_digest: str = None):
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:8] != SNAPSHOT_MAGIC:
+                raise ValueError("not a talks snapshot")
+            (header_len,) = struct.unpack('<I', mm[8:12])
+            header = json.loads(mm[12:12 + header_len])
+            if source_digest and header.get("source_sha256") != source_digest:
+                raise ValueError("snapshot is older than the CSV")
+            base = 12 + header_len
+            def block(span):
+                return mm[base + span[0]:base + span[0] + span[1]]
+            def strings(span):
+                return block(span).decode('utf-8').split('\0') if header["count"] else []
+            columns = {}
+            for name in TALK_COLUMNS:
+                spec = header["columns"][name]
+                if "codes" in spec:
+                    codes = array(spec["typecode"])
+                    codes.frombytes(block(spec["codes"]))
+                    values = [sys.intern(v) for v in strings(spec["values"])] if len(codes) else []
+                    columns[name] = DictColumn(values, codes)
+                else:
+                    columns[name] = strings(spec["strings"])
+        return cls(columns)
+
+def file_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_talk_store() -> TalkStore:
+    # Prefer the prebuilt snapshot, but only while it still matches the CSV.
     try:
-        csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'talks.csv')
-        if os.path.exists(csv_path):
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                TALKS = list(reader)
+        if not os.path.exists(TALKS_CSV_PATH):
+            return TalkStore()
+        digest = file_digest(TALKS_CSV_PATH)
+        if os.path.exists(TALKS_SNAPSHOT_PATH):
+            try:
+                return TalkStore.from_snapshot(TALKS_SNAPSHOT_PATH, digest)
+            except Exception as e:
+                print(f"Ignoring talks snapshot: {e}")
+        return TalkStore.from_csv(TALKS_CSV_PATH)
     except Exception as e:
         print(f"Error loading talks: {e}")
-        TALKS = []
+        return TalkStore()
+
+# TALK SEARCH
+# Field weights for BM25F-style scoring: a title hit counts more than an excerpt hit.
+SEARCH_FIELDS = {"title": 3.0, "speaker": 2.0, "tags": 1.5, "excerpt": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+SEARCH_MAX_EXPANSIONS = 50
+SEARCH_MAX_LIMIT = 200
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def fold_text(text: str) -> str:
+    # "Giménez" -> "gimenez" so accented and unaccented spellings meet in the index.
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(fold_text(text or ''))
+
+def trigrams(token: str) -> set:
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def weighted_terms(store, doc_id: int):
+    weighted = {}
+    length = 0.0
+    for field, weight in SEARCH_FIELDS.items():
+        for token in tokenize(store.columns[field][doc_id]):
+            weighted[token] = weighted.get(token, 0.0) + weight
+            length += weight
+    return weighted, length
+
+class TalkSearchIndex:
+    def __init__(self, store):
+        self.postings = {}
+        self.doc_len = []
+        for doc_id in range(len(store)):
+            weighted, length = weighted_terms(store, doc_id)
+            for token, tf in weighted.items():
+                self.postings.setdefault(token, {})[doc_id] = tf
+            self.doc_len.append(length)
+        self.count = len(self.doc_len)
+        self.total_len = sum(self.doc_len)
+        self.avg_len = (self.total_len / self.count) if self.count else 1.0
+        self.vocab = sorted(self.postings)
+        self._gram_index = None
+
+    def extended(self, store, start: int):
+        # Index for a store that gained rows start..len(store). Posting lists the new
+        # rows touch are copied before they change and everything else is shared, so
+        # the work follows the new rows and this index stays valid for its readers.
+        # doc_len is append-only and shared like the store's columns, so the same
+        # rule applies: only the newest version may be extended.
+        if len(self.doc_len) != self.count:
+            raise ValueError("search index has already been extended")
+        index = TalkSearchIndex.__new__(TalkSearchIndex)
+        index.postings = dict(self.postings)
+        index.doc_len = self.doc_len
+        touched = {}
+        index.total_len = self.total_len
+        for doc_id in range(start, len(store)):
+            weighted, length = weighted_terms(store, doc_id)
+            for token, tf in weighted.items():
+                postings = touched.get(token)
+                if postings is None:
+                    postings = touched[token] = index.postings[token] = dict(self.postings.get(token, ()))
+                postings[doc_id] = tf
+            index.doc_len.append(length)
+            index.total_len += length
+        index.count = len(store)
+        index.avg_len = (index.total_len / index.count) if index.count else 1.0
+        added = [token for token in touched if token not in self.postings]
+        index.vocab = sorted(self.vocab + added) if added else self.vocab
+        index._gram_index = None
+        if self._gram_index is not None:
+            grams = dict(self._gram_index)
+            for token in added:
+                for gram in trigrams(token):
+                    grams[gram] = grams.get(gram, []) + [token]
+            index._gram_index = grams
+        return index
+
+    @property
+    def gram_index(self) -> dict:
+        # Only needed for the fuzzy fallback, so it is built on first use.
+        if self._gram_index is None:
+            grams = {}
+            for token in self.vocab:
+                for gram in trigrams(token):
+                    grams.setdefault(gram, []).append(token)
+            self._gram_index = grams
+        return self._gram_index
+
+    def idf(self, token: str) -> float:
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+
+    def expand(self, term: str, prefix: bool) -> dict:
+        # Exact token first, then prefix completions for typeahead, then a fuzzy
+        # trigram match as a last resort for misspellings and mangled names.
+        expansions = {}
+        if term in self.postings:
+            expansions[term] = 1.0
+        if prefix:
+            start = bisect.bisect_left(self.vocab, term)
+            for token in self.vocab[start:start + SEARCH_MAX_EXPANSIONS]:
+                if not token.startswith(term):
+                    break
+                expansions.setdefault(token, 0.8)
+        if not expansions and len(term) >= 3:
+            grams = trigrams(term)
+            shared = {}
+            for gram in grams:
+                for token in self.gram_index.get(gram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            for token, n in shared.items():
+                dice = 2 * n / (len(grams) + len(trigrams(token)))
+                if dice >= 0.5:
+                    expansions[token] = 0.6 * dice
+            if len(expansions) > SEARCH_MAX_EXPANSIONS:
+                best = sorted(expansions.items(), key=lambda kv: -kv[1])[:SEARCH_MAX_EXPANSIONS]
+                expansions = dict(best)
+        return expansions
+
+    def search(self, query: str):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores = None
+        for i, term in enumerate(terms):
+            term_scores = {}
+            for token, boost in self.expand(term, prefix=(i == len(terms) - 1)).items():
+                idf = self.idf(token) * boost
+                for doc_id, tf in self.postings[token].items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / self.avg_len)
+                    score = idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    if score > term_scores.get(doc_id, 0.0):
+                        term_scores[doc_id] = score
+            # Every query term has to match something (AND semantics).
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {d: s + term_scores[d] for d, s in scores.items() if d in term_scores}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda d: (-scores[d], d))
+
+# SEMANTIC SEARCH
+# A latent semantic index over the talk text: TF-IDF weights of words and character
+# trigrams, projected onto the top singular vectors of the corpus. Talks that share
+# vocabulary end up near each other, so a theme query can reach talks whose titles
+# use none of its words. The model and the embedding matrix are built offline with
+# `python api/index.py build-semantic`; a query is a sparse lookup, one small matrix
+# product and a top-k over the memory-mapped matrix, with no network call. numpy is
+# imported on first use so it never slows a cold start.
+SEMANTIC_MODEL_PATH = os.getenv("SEMANTIC_MODEL_PATH", os.path.join(DATA_DIR, 'talks.semantic.npz'))
+SEMANTIC_EMBEDDINGS_PATH = os.getenv("SEMANTIC_EMBEDDINGS_PATH", os.path.join(DATA_DIR, 'talks.embeddings.npy'))
+SEMANTIC_FIELDS = {"title": 1.0, "tags": 1.0, "excerpt": 1.0, "speaker": 0.3}
+SEMANTIC_GRAM_WEIGHT = 0.4
+SEMANTIC_DIMS = 128
+SEMANTIC_MAX_FEATURES = 8192
+SEMANTIC_FIT_DOCS = 3000
+SEMANTIC_IVF_MIN_ROWS = 50000
+SEMANTIC_NPROBE = int(os.getenv("SEMANTIC_NPROBE", "8"))
+SEMANTIC_BLOCK_ROWS = 65536
+STOPWORDS = frozenset(
+    "a an and are as at be by for from his how in is it its of on or our that the "
+    "their this to unto we what who with you your".split()
+)
+
+def semantic_features(fields) -> dict:
+    # fields: (text, weight) pairs. Words count in full, their trigrams (prefixed
+    # with "#" so they never collide with a word) at a fraction, which lets
+    # "enduring" and "endure" share most of their weight.
+    counts = {}
+    for text, weight in fields:
+        for token in tokenize(text):
+            if token in STOPWORDS:
+                continue
+            counts[token] = counts.get(token, 0.0) + weight
+            if len(token) > 3:
+                for gram in trigrams(token):
+                    key = '#' + gram
+                    counts[key] = counts.get(key, 0.0) + weight * SEMANTIC_GRAM_WEIGHT
+    return {feature: 1.0 + math.log(tf) if tf >= 1 else tf for feature, tf in counts.items()}
+
+def talk_features(store, row_ids) -> list:
+    columns = [(store.columns[field], weight) for field, weight in SEMANTIC_FIELDS.items()]
+    return [semantic_features((column[i], weight) for column, weight in columns) for i in row_ids]
+
+def store_fingerprint(store, count: int) -> str:
+    # Identifies the rows an embedding matrix was built from; rows appended later
+    # are embedded at load time instead of invalidating the whole matrix.
+    digest = hashlib.sha256()
+    urls = store.columns["url"]
+    for i in range(count):
+        digest.update(urls[i].encode('utf-8') + b'\n')
+    return digest.hexdigest()
+
+def spherical_kmeans(np, data, lists: int, iterations: int = 10):
+    rng = np.random.default_rng(0)
+    sample = np.asarray(data[np.sort(rng.choice(len(data), min(len(data), lists * 64), replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(lists):
+            total = sample[assign == c].sum(axis=0)
+            norm = np.linalg.norm(total)
+            if norm:
+                centroids[c] = total / norm
+    return centroids
+
+class SemanticIndex:
+    def __init__(self, features, idf, components, embeddings, ivf=None):
+        import numpy as np
+        self.features = {feature: i for i, feature in enumerate(features)}
+        self.idf = idf
+        self.components = components
+        self.embeddings = embeddings
+        # int8 matrices hold unit vectors scaled by 127.
+        self.scale = 1.0 / 127 if embeddings.dtype == np.int8 else 1.0
+        self.tail = np.zeros((0, components.shape[1]), dtype=np.float32)
+        self.ivf = ivf
+
+    @property
+    def count(self) -> int:
+        return len(self.embeddings) + len(self.tail)
+
+    def weigh(self, feature_dicts):
+        # Dense TF-IDF rows over the model's feature columns.
+        import numpy as np
+        dense = np.zeros((len(feature_dicts), len(self.idf)), dtype=np.float32)
+        for row, feats in enumerate(feature_dicts):
+            for feature, weight in feats.items():
+                col = self.features.get(feature)
+                if col is not None:
+                    dense[row, col] = weight
+        return dense * self.idf
+
+    def embed(self, feature_dicts):
+        import numpy as np
+        vectors = self.weigh(feature_dicts) @ self.components
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed_rows(self, store, start: int, stop: int):
+        import numpy as np
+        blocks = [self.embed(talk_features(store, range(i, min(stop, i + 4096))))
+                  for i in range(start, stop, 4096)]
+        return np.concatenate(blocks) if blocks else self.tail[:0]
+
+    def extend(self, store):
+        import numpy as np
+        if len(store) > self.count:
+            self.tail = np.concatenate([self.tail, self.embed_rows(store, self.count, len(store))])
+
+    def candidates(self, query):
+        # Row blocks to score: the whole matrix, or with an IVF index only the lists
+        # whose centroids sit closest to the query. Appended rows are always scored.
+        import numpy as np
+        if self.ivf is None:
+            for start in range(0, len(self.embeddings), SEMANTIC_BLOCK_ROWS):
+                yield np.arange(start, min(len(self.embeddings), start + SEMANTIC_BLOCK_ROWS)), None
+        else:
+            centroids, order, offsets = self.ivf
+            probe = np.argsort(-(centroids @ query))[:SEMANTIC_NPROBE]
+            rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe]))
+            yield rows, None
+        if len(self.tail):
+            yield np.arange(len(self.embeddings), self.count), self.tail
+
+    def search(self, query: str, k: int) -> list:
+        import numpy as np
+        vector = self.embed([semantic_features([(query, 1.0)])])[0]
+        if not vector.any():
+            return []
+        best_ids = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for rows, block in self.candidates(vector):
+            if block is None:
+                if len(rows) == rows[-1] - rows[0] + 1:
+                    block = self.embeddings[rows[0]:rows[-1] + 1]
+                else:
+                    block = self.embeddings[rows]
+                scores = (block.astype(np.float32) @ vector) * self.scale
+            else:
+                scores = block @ vector
+            ids = np.concatenate([best_ids, rows])
+            scores = np.concatenate([best_scores, scores])
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k)[:k]
+                ids, scores = ids[keep], scores[keep]
+            best_ids, best_scores = ids, scores
+        order = np.argsort(-best_scores, kind='stable')
+        return [(int(best_ids[i]), float(best_scores[i])) for i in order if best_scores[i] > 0]
+
+    @classmethod
+    def fit(cls, store, dims: int = SEMANTIC_DIMS, dtype: str = 'float32', ivf_lists: int = None):
+        import numpy as np
+        docs = talk_features(store, range(len(store)))
+        df = {}
+        for feats in docs:
+            for feature in feats:
+                df[feature] = df.get(feature, 0) + 1
+        features = sorted(df, key=lambda f: (-df[f], f))[:SEMANTIC_MAX_FEATURES]
+        count = len(docs)
+        idf = np.array([math.log((1 + count) / (1 + df[f])) + 1 for f in features], dtype=np.float32)
+        index = cls(features, idf, np.zeros((len(features), 1), dtype=np.float32), np.zeros((0, 1), dtype=np.float32))
+
+        # Fit the projection on a sample so memory stays bounded on large corpora.
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(count, min(count, SEMANTIC_FIT_DOCS), replace=False))
+        matrix = index.weigh([docs[i] for i in sample])
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9)
+        _, _, vt = np.linalg.svd(matrix, full_matrices=False)
+        dims = max(1, min(dims, len(vt) - 1))
+        index.components = np.ascontiguousarray(vt[:dims].T, dtype=np.float32)
+
+        embeddings = np.concatenate([index.embed(docs[i:i + 4096]) for i in range(0, count, 4096)]) if count else np.zeros((0, dims), dtype=np.float32)
+        if dtype == 'int8':
+            embeddings = np.round(embeddings * 127).astype(np.int8)
+        index.embeddings = embeddings
+        index.scale = 1.0 / 127 if dtype == 'int8' else 1.0
+        index.tail = np.zeros((0, dims), dtype=np.float32)
+        if ivf_lists is None and count >= SEMANTIC_IVF_MIN_ROWS:
+            ivf_lists = int(math.sqrt(count))
+        if ivf_lists:
+            index.ivf = index.build_ivf(ivf_lists)
+        return index
+
+    def build_ivf(self, lists: int):
+        import numpy as np
+        centroids = spherical_kmeans(np, self.embeddings, lists)
+        assign = np.concatenate([
+            np.argmax(np.asarray(self.embeddings[i:i + SEMANTIC_BLOCK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+            for i in range(0, len(self.embeddings), SEMANTIC_BLOCK_ROWS)
+        ])
+        order = np.argsort(assign, kind='stable')
+        offsets = np.searchsorted(assign[order], np.arange(lists + 1))
+        return centroids, order, offsets
+
+    def save(self, model_path: str, embeddings_path: str, fingerprint: str):
+        import numpy as np
+        features = sorted(self.features, key=self.features.get)
+        extra = {}
+        if self.ivf is not None:
+            extra = dict(zip(("ivf_centroids", "ivf_order", "ivf_offsets"), self.ivf))
+        np.save(embeddings_path, self.embeddings)
+        np.savez(model_path, features=np.array(features), idf=self.idf, components=self.components,
+                 fingerprint=np.array(fingerprint), count=np.array(len(self.embeddings)), **extra)
+
+    @classmethod
+    def load(cls, store, model_path: str, embeddings_path: str):
+        import numpy as np
+        with np.load(model_path) as model:
+            count = int(model["count"])
+            if count > len(store) or str(model["fingerprint"]) != store_fingerprint(store, count):
+                raise ValueError("semantic index was built from different talks")
+            ivf = None
+            if "ivf_centroids" in model:
+                ivf = (model["ivf_centroids"], model["ivf_order"], model["ivf_offsets"])
+            index = cls(model["features"].tolist(), model["idf"], model["components"],
+                        np.load(embeddings_path, mmap_mode='r'), ivf)
+        if len(index.embeddings) != count:
+            raise ValueError("semantic embeddings do not match the model")
+        index.extend(store)
+        return index
+
+def load_semantic_index(store) -> SemanticIndex:
+    # Raises ImportError without numpy. A missing or stale prebuilt index is rebuilt
+    # in memory, which takes about a second for the shipped corpus.
+    if os.path.exists(SEMANTIC_MODEL_PATH) and os.path.exists(SEMANTIC_EMBEDDINGS_PATH):
+        try:
+            return SemanticIndex.load(store, SEMANTIC_MODEL_PATH, SEMANTIC_EMBEDDINGS_PATH)
+        except ImportError:
+            raise
+        except Exception as e:
+            print(f"Ignoring semantic index: {e}")
+    return SemanticIndex.fit(store)
+
+# TALK TEXT
+# Full talk text, fetched offline with `python api/index.py ingest-text` and stored
+# zlib-compressed in sqlite, keyed by the CSV url. When a talk is analyzed its text
+# is split into chunks of about TALK_CHUNK_WORDS words; the opening chunk plus the
+# chunks that best match the title and focus (BM25 within the talk) are packed in
+# reading order into a per-length character budget. The model then works from the
+# talk itself instead of recalling it from a title.
+TALK_TEXT_PATH = os.getenv("TALK_TEXT_PATH", os.path.join(DATA_DIR, 'talk_text.sqlite3'))
+TALK_CHUNK_WORDS = 150
+TALK_CONTEXT_CHARS = {"brief": 3000, "standard": 6000, "deep": 10000}
+TALK_CHUNK_CACHE_ENTRIES = 64
+INGEST_CONCURRENCY = 4
+INGEST_USER_AGENT = "Mozilla/5.0 (compatible; live-the-word-ingest/1.0)"
+
+class TalkTextParser(HTMLParser):
+    # Collects paragraph text from a conference talk page. Paragraphs inside the
+    # "body-block" container are preferred; footnote markers (<sup>) are skipped.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.body_depth = None
+        self.in_p = False
+        self.skip = 0
+        self.current = []
+        self.body = []
+        self.other = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('br', 'img', 'meta', 'link', 'input', 'hr', 'source', 'wbr'):
+            return
+        self.depth += 1
+        if self.body_depth is None and 'body-block' in (dict(attrs).get('class') or ''):
+            self.body_depth = self.depth
+        if tag == 'p':
+            self.in_p = True
+            self.current = []
+        elif tag in ('sup', 'script', 'style') and self.in_p:
+            self.skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('sup', 'script', 'style') and self.skip:
+            self.skip -= 1
+        elif tag == 'p' and self.in_p:
+            self.in_p = False
+            text = " ".join("".join(self.current).split())
+            if text:
+                (self.body if self.body_depth is not None else self.other).append(text)
+        if self.depth == self.body_depth:
+            self.body_depth = None
+        self.depth -= 1
+
+    def handle_data(self, data):
+        if self.in_p and not self.skip:
+            self.current.append(data)
+
+    def paragraphs(self) -> list:
+        return self.body or self.other
+
+def extract_talk_text(html: str) -> str:
+    parser = TalkTextParser()
+    parser.feed(html)
+    parser.close()
+    return "\n\n".join(parser.paragraphs())
+
+def chunk_text(text: str) -> list:
+    # Whole paragraphs are merged until a chunk reaches TALK_CHUNK_WORDS words;
+    # a single paragraph longer than twice that is cut at word boundaries.
+    chunks, current, words = [], [], 0
+    for paragraph in text.split("\n\n"):
+        tokens = paragraph.split()
+        while len(tokens) > 2 * TALK_CHUNK_WORDS:
+            chunks.append(" ".join(tokens[:TALK_CHUNK_WORDS]))
+            tokens = tokens[TALK_CHUNK_WORDS:]
+        if not tokens:
+            continue
+        current.append(" ".join(tokens))
+        words += len(tokens)
+        if words >= TALK_CHUNK_WORDS:
+            chunks.append("\n".join(current))
+            current, words = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def select_chunks(chunks: list, query: str, budget: int) -> list:
+    # Returns chunk indexes in reading order. The opening chunk is always kept, then
+    # the best BM25 matches for the query until the character budget is spent.
+    if sum(len(c) for c in chunks) <= budget:
+        return list(range(len(chunks)))
+    docs = [tokenize(c) for c in chunks]
+    avg_len = sum(len(d) for d in docs) / len(docs)
+    terms = set(tokenize(query)) - STOPWORDS
+    df = {t: sum(1 for d in docs if t in d) for t in terms}
+    scores = []
+    for i, doc in enumerate(docs):
+        score = 0.0
+        for term in terms:
+            tf = doc.count(term)
+            if tf:
+                idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_len))
+        scores.append(score)
+    order = [0] + sorted(range(1, len(chunks)), key=lambda i: (-scores[i], i))
+    chosen, used = [], 0
+    for i in order:
+        if used + len(chunks[i]) <= budget:
+            chosen.append(i)
+            used += len(chunks[i])
+    return sorted(chosen)
+
+class TalkTextStore:
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.chunk_cache = OrderedDict()
+        if writable:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS talk_text ("
+                "url TEXT PRIMARY KEY, text BLOB NOT NULL, fetched REAL NOT NULL)"
+            )
+            self._db().commit()
+
+    def _db(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if self.writable:
+                conn = sqlite3.connect(self.path, timeout=5)
+            else:
+                # Read-only, so a deployment's bundled file is never locked or modified.
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+            self.local.conn = conn
+        return conn
+
+    def get(self, url: str):
+        if not url or (not self.writable and not os.path.exists(self.path)):
+            return None
+        try:
+            row = self._db().execute("SELECT text FROM talk_text WHERE url = ?", (url,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Talk text read error: {e}")
+            return None
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def put(self, url: str, text: str):
+        conn = self._db()
+        conn.execute(
+            "INSERT OR REPLACE INTO talk_text (url, text, fetched) VALUES (?, ?, ?)",
+            (url, zlib.compress(text.encode('utf-8'), 9), time.time())
+        )
+        conn.commit()
+
+    def urls(self) -> set:
+        return {row[0] for row in self._db().execute("SELECT url FROM talk_text")}
+
+    def chunks(self, url: str):
+        with self.lock:
+            if url in self.chunk_cache:
+                self.chunk_cache.move_to_end(url)
+                return self.chunk_cache[url]
+        text = self.get(url)
+        chunks = chunk_text(text) if text else None
+        with self.lock:
+            self.chunk_cache[url] = chunks
+            while len(self.chunk_cache) > TALK_CHUNK_CACHE_ENTRIES:
+                self.chunk_cache.popitem(last=False)
+        return chunks
+
+TALK_TEXT = TalkTextStore(TALK_TEXT_PATH)
+
+def talk_context(values: dict, data: dict) -> str:
+    # Grounding block for the talk prompt, or '' when no text is available. The url
+    # comes from the request, or from the talk list when only a title was sent.
+    url = data.get('url') or ''
+    url = url.strip() if isinstance(url, str) else ''
+    talks = talk_data()
+    if not url:
+        url = talks.talk_url(values.get('title', ''), values.get('speaker', ''))
+    chunks = TALK_TEXT.chunks(url)
+    if not chunks:
+        row_id = talks.url_rows.get(url)
+        excerpt = talks.store.columns["excerpt"][row_id] if row_id is not None else ''
+        chunks = [excerpt] if excerpt else None
+    if not chunks:
+        return ''
+    budget = TALK_CONTEXT_CHARS.get(data.get('length'), TALK_CONTEXT_CHARS["standard"])
+    query = f"{values.get('title', '')} {values.get('focus', '')} {values.get('focus', '')}"
+    selected = select_chunks(chunks, query, budget)
+    if not selected:
+        return ''
+    passages = []
+    for prev, i in zip([-1] + selected, selected):
+        if i != prev + 1:
+            passages.append("[...]")
+        passages.append(chunks[i])
+    return (
+        "TALK TEXT (excerpts in order; base the summary and quotes only on this text):\n"
+        + "\n\n".join(passages) + "\n"
+    )
+
+# TALK FACETS
+# Row ids per distinct facet value, kept in ascending row order so results stay in
+# CSV order and a row id can double as a pagination cursor.
+FACET_FIELDS = ("year", "month", "speaker", "session")
+FILTER_DEFAULT_LIMIT = 100
+FILTER_MAX_LIMIT = 500
+FILTER_CACHE_ENTRIES = 256
+TALKS_DEFAULT_LIMIT = 200
+TALKS_MAX_LIMIT = 1000
+NDJSON_BATCH_ROWS = 500
+
+def facet_value(field: str, value: str) -> str:
+    value = (value or '').strip()
+    return fold_text(value) if field in ("month", "speaker", "session") else value
+
+class TalkFacets:
+    def __init__(self, store):
+        self.ids = {field: {} for field in FACET_FIELDS}
+        self.labels = {field: {} for field in FACET_FIELDS}
+        for field in FACET_FIELDS:
+            ids, labels = self.ids[field], self.labels[field]
+            for row_id, raw in enumerate(store.column(field)):
+                raw = raw.strip()
+                if not raw:
+                    continue
+                key = facet_value(field, raw)
+                ids.setdefault(key, []).append(row_id)
+                labels.setdefault(key, raw)
+
+    def extended(self, store, start: int):
+        # Same copy-on-write scheme as TalkSearchIndex.extended.
+        facets = TalkFacets.__new__(TalkFacets)
+        facets.ids = {field: dict(ids) for field, ids in self.ids.items()}
+        facets.labels = {field: dict(labels) for field, labels in self.labels.items()}
+        for field in FACET_FIELDS:
+            ids, labels, column = facets.ids[field], facets.labels[field], store.columns[field]
+            touched = set()
+            for row_id in range(start, len(store)):
+                raw = column[row_id].strip()
+                if not raw:
+                    continue
+                key = facet_value(field, raw)
+                if key not in touched:
+                    touched.add(key)
+                    ids[key] = list(ids.get(key, ()))
+                ids[key].append(row_id)
+                labels.setdefault(key, raw)
+        return facets
+
+    def values(self, field: str) -> list:
+        return list(self.labels[field].values())
+
+    def counts(self, field: str) -> list:
+        return [{"value": self.labels[field][k], "count": len(v)} for k, v in self.ids[field].items()]
 
-load_talks()
+    def match(self, filters: dict):
+        # Intersect the smallest posting list with the others; None means "no filter".
+        lists = []
+        for field, value in filters.items():
+            if not value:
+                continue
+            lists.append(self.ids[field].get(facet_value(field, value), []))
+        if not lists:
+            return None
+        lists.sort(key=len)
+        if len(lists) == 1:
+            return lists[0]
+        rest = [set(ids) for ids in lists[1:]]
+        return [i for i in lists[0] if all(i in other for other in rest)]
+
+def json_body(data):
+    body = app.json.dumps(data).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+# Compressed variants of serialized bodies, keyed by (etag, encoding), so a body is
+# compressed once and then served from memory. Each encoding gets its own strong
+# ETag because the bytes differ.
+COMPRESS_MIN_BYTES = 1024
+COMPRESSED_ENTRIES = 256
+_COMPRESSED = OrderedDict()
+_COMPRESSED_LOCK = threading.Lock()
+
+def accepted_encoding(size: int):
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accept = request.accept_encodings
+    if brotli is not None and accept.quality('br') > 0:
+        return 'br'
+    if accept.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    # Bodies built once per deployment get the slow maximum settings (brotli 11 is
+    # ~350 ms for the full talk list but ~20% smaller than gzip); per-query pages
+    # get fast ones.
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if static else 5)
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+def compressed_body(body: bytes, etag: str, encoding: str, static: bool = False) -> bytes:
+    key = (etag, encoding)
+    with _COMPRESSED_LOCK:
+        data = _COMPRESSED.get(key)
+        if data is not None:
+            _COMPRESSED.move_to_end(key)
+            return data
+    data = compress(body, encoding, static)
+    with _COMPRESSED_LOCK:
+        _COMPRESSED[key] = data
+        while len(_COMPRESSED) > COMPRESSED_ENTRIES:
+            _COMPRESSED.popitem(last=False)
+    return data
+
+def conditional_json(body: bytes, etag: str, max_age: int = 300, static: bool = False):
+    encoding = accepted_encoding(len(body))
+    if encoding:
+        body = compressed_body(body, etag, encoding, static)
+        etag = f"{etag}-{encoding}"
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if len(body) >= COMPRESS_MIN_BYTES or encoding:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={max_age}, s-maxage={max_age}, stale-while-revalidate={max_age * 12}"
+    return response.make_conditional(request)
+
+_STATIC_BODIES = {}
+
+def static_json(name: str, data):
+    # Constant payloads (canons, topic lists) are serialized on first request only.
+    entry = _STATIC_BODIES.get(name)
+    if entry is None:
+        entry = _STATIC_BODIES[name] = json_body(data)
+    return conditional_json(*entry, max_age=3600, static=True)
+
+def build_facet_bodies(facets):
+    years = sorted(facets.values("year"), reverse=True)
+    return {
+        "years": json_body(years),
+        "speakers": json_body(sorted(facets.counts("speaker"), key=lambda f: fold_text(f["value"]))),
+        "sessions": json_body(sorted(facets.values("session"))),
+    }
+
+class TalkData:
+    # Everything derived from one version of the talk store. Handlers take a single
+    # reference via talk_data() so a reload never mixes two versions.
+    def __init__(self, store, index=None, facets=None, url_rows=None):
+        self.store = store
+        self.index = index or TalkSearchIndex(store)
+        self.facets = facets or TalkFacets(store)
+        self.facet_bodies = build_facet_bodies(self.facets)
+        self.filter_cache = OrderedDict()
+        self.filter_lock = threading.Lock()
+        self._semantic = None
+        self._semantic_lock = threading.Lock()
+        if url_rows is None:
+            urls = store.columns["url"]
+            url_rows = {urls[i]: i for i in range(len(store))}
+        self.url_rows = url_rows
+        self._title_rows = None
+        self._all_body = None
+
+    def extended(self, talks: list):
+        # The next version with `talks` appended, built from this one in time
+        # proportional to the new rows; this version is left untouched for readers
+        # that still hold it.
+        start = len(self.store)
+        store = self.store.extended(talks)
+        url_rows = dict(self.url_rows)
+        for row_id in range(start, len(store)):
+            url_rows.setdefault(store.columns["url"][row_id], row_id)
+        data = TalkData(store, self.index.extended(store, start), self.facets.extended(store, start), url_rows)
+        semantic = self._semantic
+        if semantic is not None:
+            semantic = copy.copy(semantic)
+            semantic.extend(store)
+            data._semantic = semantic
+        return data
+
+    @property
+    def all_body(self):
+        # The full /api/talks payload, serialized once per version of the store.
+        if self._all_body is None:
+            self._all_body = json_body(self.store.rows(range(len(self.store))))
+        return self._all_body
+
+    def talk_url(self, title: str, speaker: str = '') -> str:
+        # Best match for a talk sent by title only, e.g. from a batch item.
+        if self._title_rows is None:
+            rows = {}
+            for i, t in enumerate(self.store.column("title")):
+                rows.setdefault(normalize_input(t), []).append(i)
+            self._title_rows = rows
+        candidates = self._title_rows.get(normalize_input(title), [])
+        speakers = self.store.columns["speaker"]
+        for i in candidates:
+            if not speaker or normalize_input(speakers[i]) == normalize_input(speaker):
+                return self.store.columns["url"][i]
+        return ''
+
+    @property
+    def semantic(self) -> SemanticIndex:
+        # Loaded on the first semantic query; most requests never need numpy.
+        if self._semantic is None:
+            with self._semantic_lock:
+                if self._semantic is None:
+                    self._semantic = load_semantic_index(self.store)
+        return self._semantic
+
+_TALK_DATA = None
+_TALK_LOAD_LOCK = threading.Lock()
+
+def load_talks():
+    global _TALK_DATA
+    _TALK_DATA = TalkData(load_talk_store())
+    return _TALK_DATA
+
+def clean_talk(talk: dict) -> dict:
+    # Missing and null fields read as ''; anything else that is not text is refused
+    # rather than stored as its repr.
+    cleaned = {}
+    for name in TALK_COLUMNS:
+        value = talk.get(name) or ''
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+        cleaned[name] = value.strip()
+    return cleaned
+
+def append_talks_csv(path: str, talks: list):
+    # Keeps the file's own column order; appending costs only the new rows.
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        fieldnames = next(csv.reader(f), None) or TALK_COLUMNS
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writerows(talks)
+
+def ingest_talks(talks: list, persist_path: str = None) -> dict:
+    # Appends new talks to the live dataset. Rows without a url or with one already
+    # present are skipped; the new version replaces the old in one assignment, so a
+    # handler sees either all of the new rows or none of them. With persist_path the
+    # new rows are also appended to that CSV. A talk with a non-text field raises
+    # ValueError before anything is added.
+    global _TALK_DATA
+    talk_data()
+    with _TALK_LOAD_LOCK:
+        current = _TALK_DATA
+        seen = set()
+        fresh = []
+        counts = {"added": 0, "duplicates": 0, "invalid": 0}
+        for n, talk in enumerate(talks):
+            try:
+                talk = clean_talk(talk) if isinstance(talk, dict) else None
+            except ValueError as e:
+                raise ValueError(f"Talk {n}: {e}") from None
+            if not talk or not talk["url"] or not talk["title"]:
+                counts["invalid"] += 1
+            elif talk["url"] in current.url_rows or talk["url"] in seen:
+                counts["duplicates"] += 1
+            else:
+                seen.add(talk["url"])
+                fresh.append(talk)
+        if fresh:
+            _TALK_DATA = current.extended(fresh)
+            counts["added"] = len(fresh)
+            if persist_path:
+                append_talks_csv(persist_path, fresh)
+        counts["total"] = len(_TALK_DATA.store)
+    return counts
+
+def talk_data() -> TalkData:
+    # Loaded on first use of a talks endpoint rather than at import, so cold starts
+    # that only serve / or /api/canons never parse the dataset.
+    data = _TALK_DATA
+    if data is None:
+        with _TALK_LOAD_LOCK:
+            data = _TALK_DATA or load_talks()
+    return data
+
+def page_args(default_limit: int, max_limit: int):
+    # (offset, limit, cursor) for every paged route. Missing values take their
+    # defaults (cursor None) and a limit above max_limit is capped; anything else
+    # that is not a whole number in range raises ValueError, which routes turn into
+    # a 400. The cursor is the last row id of the previous page.
+    offset = int_arg('offset', 0, 0)
+    limit = min(max_limit, int_arg('limit', default_limit, 1))
+    cursor = int_arg('cursor', None, 0)
+    return offset, limit, cursor
+
+def int_arg(name: str, default, minimum: int):
+    raw = request.args.get(name, '').strip()
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = None
+    if value is None or value < minimum:
+        raise ValueError(f"Invalid {name}: {raw!r}")
+    return value
+
+# METRICS
+# In-process counters and log-bucketed latency histograms (two buckets per
+# doubling from 50us to ~100s, HDR-style), exported as Prometheus text by
+# /api/metrics. Recording is a bisect and two increments under a lock.
+HISTOGRAM_BOUNDS = [0.00005 * 2 ** (i / 2) for i in range(42)]
+SERVER_TIMING_ALWAYS = os.getenv("SERVER_TIMING", "") == "1"
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+        self.total += value
+        self.count += 1
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def render(self, extra_counters=(), gauges=()) -> str:
+        def fmt(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+        lines = []
+        with self.lock:
+            counters = sorted(list(self.counters.items()) + list(extra_counters))
+            histograms = sorted(self.histograms.items(), key=lambda kv: kv[0])
+            snapshot = [(key, list(h.counts), h.total, h.count) for key, h in histograms]
+        typed = set()
+        for (name, labels), value in sorted(gauges):
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{fmt(labels)} {value}")
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt(labels)} {value}")
+        for (name, labels), counts, total, count in snapshot:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, n in zip(HISTOGRAM_BOUNDS, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{fmt(labels + (('le', f'{bound:.6g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{fmt(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{fmt(labels)} {total:.6f}")
+            lines.append(f"{name}_count{fmt(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+class StageTimer:
+    # Splits one operation into consecutive named stages (seconds per stage).
+    def __init__(self):
+        self.stages = {}
+        self.last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def merge(self, other):
+        for stage, seconds in other.stages.items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.last = time.perf_counter()
+
+def record_stages(kind_name: str, length: str, timer: StageTimer):
+    for stage, seconds in timer.stages.items():
+        METRICS.observe("summary_stage_seconds", seconds, kind=kind_name, length=length, stage=stage)
+    if 'server_timing' in g:
+        g.server_timing.update(timer.stages)
+
+def wants_server_timing() -> bool:
+    return SERVER_TIMING_ALWAYS or request.args.get('timing') == '1' or request.headers.get('X-Server-Timing') == '1'
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    if wants_server_timing():
+        g.server_timing = {}
+
+@app.after_request
+def finish_request_metrics(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or 'unmatched'
+    METRICS.observe("http_request_duration_seconds", elapsed, endpoint=endpoint, method=request.method)
+    METRICS.inc("http_requests_total", endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if 'server_timing' in g:
+        parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in g.server_timing.items()]
+        parts.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+# SUMMARY CACHE
+# Two tiers: an in-process LRU in front of a SQLite file that survives restarts
+# (on Vercel only /tmp is writable, so that is the default location).
+TEMPERATURE = 0.2
+CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join(tempfile.gettempdir(), "summary_cache.sqlite3"))
+CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(30 * 24 * 3600)))
+CACHE_MEMORY_ENTRIES = int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", "512"))
+CACHE_DISK_ENTRIES = int(os.getenv("SUMMARY_CACHE_DISK_ENTRIES", "20000"))
+
+class SummaryCache:
+    def __init__(self, path, ttl, memory_entries, disk_entries):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.disk_ok = True
+        try:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db().execute("CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries(accessed)")
+            self._db().commit()
+        except Exception as e:
+            print(f"Summary cache disk tier disabled: {e}")
+            self.disk_ok = False
+
+    def _db(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread.
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created < self.ttl:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.memory[key]
+        value = None
+        if self.disk_ok:
+            try:
+                conn = self._db()
+                row = conn.execute("SELECT value, created FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if now - row[1] < self.ttl:
+                        value = json.loads(row[0])
+                        conn.execute("UPDATE summaries SET accessed = ? WHERE key = ?", (now, key))
+                        conn.commit()
+                        self._remember(key, row[1], value)
+                    else:
+                        conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                        conn.commit()
+            except Exception as e:
+                print(f"Summary cache read error: {e}")
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        self._remember(key, now, value)
+        if not self.disk_ok:
+            return
+        try:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            # Evict least recently used rows once the file grows past its bound.
+            conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                "SELECT key FROM summaries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.disk_entries,)
+            )
+            conn.commit()
+        except Exception as e:
+            print(f"Summary cache write error: {e}")
+
+    def _remember(self, key, created, value):
+        with self.lock:
+            self.memory[key] = (created, value)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self.memory)}
+
+SUMMARY_CACHE = SummaryCache(CACHE_PATH, CACHE_TTL, CACHE_MEMORY_ENTRIES, CACHE_DISK_ENTRIES)
+
+def normalize_input(value) -> str:
+    return " ".join(str(value).split()).lower()
+
+def summary_cache_key(endpoint: str, template: dict, inputs: dict) -> str:
+    # `template` is the full completion request with placeholders for the inputs
+    # (SummaryKind.template), so editing any prompt text, the length guidance, the
+    # token caps, the response format or MODEL makes old entries unreachable; they
+    # age out via TTL/LRU.
+    payload = {
+        "endpoint": endpoint,
+        "template": hashlib.sha256(json.dumps(template, sort_keys=True).encode('utf-8')).hexdigest(),
+        "inputs": {k: normalize_input(v) for k, v in inputs.items()},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+# UPSTREAM DISPATCH
+# Completions run on one event loop in a daemon thread over a pooled connection,
+# and identical concurrent requests (same cache key) share a single completion;
+# streamed requests share one upstream stream, each subscriber replaying it from
+# the first chunk. Request threads still block until their result arrives, so the
+# gain is fewer and bounded upstream calls, not fewer busy workers. In-flight calls are bounded by an AIMD limit that halves on
+# upstream 429s, 5xx and timeouts and creeps back up while calls succeed at normal
+# latency. Calls over the limit wait in a bounded FIFO queue with a deadline and
+# fail fast with UpstreamOverloaded (503) rather than piling onto the API;
+# transient failures are retried with jittered exponential backoff.
+SYSTEM_PROMPT = "Return only a valid JSON object that matches the schema. No prose outside JSON."
+NORMALIZE_REPLACEMENTS = {"\u2019":"'","\u201C":'"',"\u201D":'"',"\u2013":"-","\u2014":"-"}
+UPSTREAM_MIN_CONCURRENCY = int(os.getenv("UPSTREAM_MIN_CONCURRENCY", "2"))
+UPSTREAM_QUEUE_MAX = int(os.getenv("UPSTREAM_QUEUE_MAX", "64"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "15"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))
+UPSTREAM_BACKOFF_MAX = 8.0
+# Recent latency above this multiple of the long-run average pauses limit growth.
+UPSTREAM_LATENCY_TOLERANCE = 1.5
+
+class UpstreamOverloaded(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def upstream_status(e: Exception):
+    # HTTP status of an openai/httpx error; 0 for connection errors and timeouts
+    # that never got a response, None for anything that is not an upstream error.
+    if type(e).__module__.split('.')[0] not in ('openai', 'httpx', 'httpcore'):
+        return None
+    return getattr(e, 'status_code', None) or 0
+
+def overload_error(e: Exception) -> bool:
+    status = upstream_status(e)
+    return isinstance(e, TimeoutError) or status == 0 or status == 429 or (status or 0) >= 500
+
+def retry_after_seconds(e: Exception):
+    if isinstance(e, UpstreamOverloaded):
+        return e.retry_after
+    headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    return None
+
+def retry_delay(e: Exception, attempt: int):
+    # Seconds to wait before retrying, or None when the error is not worth retrying.
+    if attempt >= UPSTREAM_RETRIES or not overload_error(e):
+        return None
+    hinted = retry_after_seconds(e)
+    if hinted is not None:
+        return min(hinted, UPSTREAM_BACKOFF_MAX) + random.uniform(0, UPSTREAM_BACKOFF)
+    return random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF * 2 ** (attempt + 1)))
+
+class AdaptiveLimit:
+    # Only touched from the dispatcher loop. A released slot is handed straight to
+    # the oldest waiter, so queued calls are served in arrival order. Background
+    # calls (batch work) queue separately and only get slots no interactive call
+    # is waiting for.
+    def __init__(self, maximum: int, minimum: int, clock=time.monotonic):
+        self.maximum = maximum
+        self.minimum = max(1, min(minimum, maximum))
+        self.limit = float(maximum)
+        self.inflight = 0
+        self.waiters = deque()
+        self.background = deque()
+        self.clock = clock
+        self.latency_fast = None
+        self.latency_slow = None
+        self.last_decrease = 0.0
+
+    def retry_after(self) -> float:
+        return math.ceil((len(self.waiters) / self.limit + 1) * (self.latency_slow or 1.0))
+
+    async def acquire(self, timeout):
+        # timeout=None is background work: it waits without a deadline, behind every
+        # interactive waiter, so it neither fills nor delays the bounded queue.
+        waiters = self.background if timeout is None else self.waiters
+        if self.inflight < int(self.limit) and not self.waiters and not (timeout is None and self.background):
+            self.inflight += 1
+            return
+        if timeout is not None and len(self.waiters) >= UPSTREAM_QUEUE_MAX:
+            METRICS.inc("upstream_rejected_total", reason='queue_full')
+            raise UpstreamOverloaded("Too many requests are waiting for the AI service; try again shortly", self.retry_after())
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        waiters.append(waiter)
+        expired = []
+        def expire():
+            if not waiter.done():
+                expired.append(True)
+                waiter.cancel()
+        handle = loop.call_later(timeout, expire) if timeout is not None else None
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in waiters:
+                waiters.remove(waiter)
+            if expired:
+                METRICS.inc("upstream_rejected_total", reason='deadline')
+                raise UpstreamOverloaded(f"No AI capacity within {timeout:g}s; try again shortly", self.retry_after()) from None
+            raise
+        finally:
+            if handle:
+                handle.cancel()
+
+    def release(self, latency: float = None, overloaded: bool = False):
+        saturated = self.inflight >= int(self.limit)
+        self.inflight -= 1
+        if overloaded:
+            now = self.clock()
+            # One overload episode usually fails several calls at once; count it once.
+            if now - self.last_decrease > (self.latency_slow or 1.0):
+                self.limit = max(self.minimum, self.limit / 2)
+                self.last_decrease = now
+        elif latency is not None:
+            if self.latency_slow is None:
+                self.latency_fast = self.latency_slow = latency
+            else:
+                self.latency_fast += 0.3 * (latency - self.latency_fast)
+                self.latency_slow += 0.02 * (latency - self.latency_slow)
+            # Grow by about one slot per limit's worth of successes, and only while the
+            # limit is actually what bounds concurrency.
+            if saturated and self.latency_fast <= UPSTREAM_LATENCY_TOLERANCE * self.latency_slow:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        while (self.waiters or self.background) and self.inflight < int(self.limit):
+            waiter = (self.waiters or self.background).popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+class StreamFanout:
+    # The chunks of one upstream stream, kept until it ends so that a subscriber
+    # joining late still sees it from the start. A chunk, an exception, then None.
+    def __init__(self):
+        self.items = []
+        self.cond = threading.Condition()
+
+    def put(self, item):
+        with self.cond:
+            self.items.append(item)
+            self.cond.notify_all()
+
+    def subscribe(self):
+        i = 0
+        while True:
+            with self.cond:
+                if not self.cond.wait_for(lambda: i < len(self.items), UPSTREAM_TIMEOUT):
+                    raise TimeoutError("Timed out waiting for the AI stream")
+                item = self.items[i]
+            i += 1
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+class UpstreamDispatcher:
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.loop = None
+        self.slots = AdaptiveLimit(concurrency, UPSTREAM_MIN_CONCURRENCY)
+        self.inflight = {}
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    def _start(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='upstream-dispatch', daemon=True).start()
+                self.loop = loop
+            return self.loop
+
+    async def _create(self, kwargs: dict, queue_timeout, timer=None):
+        # Returns (response, start time) still holding a slot; the caller releases it.
+        for attempt in itertools.count():
+            await self.slots.acquire(queue_timeout)
+            if timer:
+                timer.mark('queue')
+            started = time.perf_counter()
+            try:
+                return await get_client().chat.completions.create(**kwargs), started
+            except Exception as e:
+                self.slots.release(overloaded=overload_error(e))
+                delay = retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                METRICS.inc("upstream_retries_total", type=error_type(e))
+                if timer:
+                    timer.mark('upstream')
+                await asyncio.sleep(delay)
+                if timer:
+                    timer.mark('backoff')
+
+    async def complete(self, timer=None, queue_timeout=UPSTREAM_QUEUE_TIMEOUT, **kwargs):
+        response, started = await self._create(kwargs, queue_timeout, timer)
+        self.slots.release(latency=time.perf_counter() - started)
+        if timer:
+            timer.mark('upstream')
+        return response
+
+    def submit(self, key, make_coro):
+        loop = self._start()
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = asyncio.run_coroutine_threadsafe(make_coro(), loop)
+            self.inflight[key] = future
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def pending(self, key):
+        # The in-flight non-streamed completion for this key, if any.
+        with self.lock:
+            return self.inflight.get(key)
+
+    def stream(self, key, queue_timeout=UPSTREAM_QUEUE_TIMEOUT, **kwargs):
+        # Returns (chunks, leader): a plain generator over the async completion stream
+        # for Flask, and whether this caller started it. Identical concurrent requests
+        # subscribe to the same stream. Only opening the stream is retried; once
+        # chunks flow a failure is final. The pump runs to the end even if the
+        # leader's client disconnects, so later subscribers still get everything.
+        with self.lock:
+            fanout = self.streams.get(key)
+            if fanout is not None:
+                self.coalesced += 1
+                return fanout.subscribe(), False
+            fanout = self.streams[key] = StreamFanout()
+        async def pump():
+            try:
+                stream, started = await self._create(dict(kwargs, stream=True), queue_timeout)
+                try:
+                    async for chunk in stream:
+                        fanout.put(chunk)
+                except Exception as e:
+                    self.slots.release(overloaded=overload_error(e))
+                    raise
+                self.slots.release(latency=time.perf_counter() - started)
+            except Exception as e:
+                fanout.put(e)
+            finally:
+                with self.lock:
+                    if self.streams.get(key) is fanout:
+                        del self.streams[key]
+                fanout.put(None)
+        asyncio.run_coroutine_threadsafe(pump(), self._start())
+        return fanout.subscribe(), True
+
+    def stats(self):
+        with self.lock:
+            stats = {"inflight": len(self.inflight), "streams": len(self.streams), "coalesced": self.coalesced, "concurrency": self.concurrency}
+        stats.update(limit=round(self.slots.limit, 2), active=self.slots.inflight, queued=len(self.slots.waiters),
+                     background=len(self.slots.background))
+        return stats
+
+DISPATCHER = UpstreamDispatcher(UPSTREAM_CONCURRENCY)
+
+# RATE LIMITING
+# A token bucket per client IP in front of every summarize call that has to go
+# upstream (cache hits are free). Buckets hold RATE_LIMIT_BURST requests and refill
+# at RATE_LIMIT_PER_MINUTE; the least recently seen clients are forgotten past
+# RATE_LIMIT_CLIENTS. Limits are per process, so on serverless hosts they apply per
+# instance. RATE_LIMIT_PER_MINUTE=0 disables the limiter.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_CLIENTS = 10000
+
+class RateLimiter:
+    def __init__(self, per_minute: float, burst: float, max_clients: int = RATE_LIMIT_CLIENTS, clock=time.monotonic):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def take(self, key: str, cost: float = 1) -> float:
+        # Returns 0 when the request may proceed, else the seconds until it could;
+        # math.inf when it costs more than a full bucket and never could.
+        if self.rate <= 0:
+            return 0.0
+        if cost > self.burst:
+            return math.inf
+        now = self.clock()
+        with self.lock:
+            tokens = self._refill(key, now)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / self.rate
+            if not wait:
+                tokens -= cost
+            self._store(key, tokens, now)
+        return wait
+
+    def take_up_to(self, key: str, cost: int, minimum: int = 1) -> int:
+        # Takes as many whole tokens as the bucket holds, up to `cost`; none when that
+        # is below `minimum`. Returns how many were taken.
+        if self.rate <= 0:
+            return cost
+        minimum = min(minimum, math.floor(self.burst))
+        now = self.clock()
+        with self.lock:
+            tokens = self._refill(key, now)
+            granted = min(cost, math.floor(tokens))
+            if granted < minimum:
+                granted = 0
+            self._store(key, tokens - granted, now)
+        return granted
+
+    def wait(self, key: str, cost: float) -> float:
+        # Seconds until `cost` tokens (at most a full bucket) are available, taking none.
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        with self.lock:
+            tokens = self._refill(key, now)
+            self._store(key, tokens, now)
+        return max(0.0, (min(cost, self.burst) - tokens) / self.rate)
+
+    def _refill(self, key: str, now: float) -> float:
+        tokens, updated = self.buckets.pop(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def _store(self, key: str, tokens: float, now: float):
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+
+RATE_LIMITER = RateLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+
+def client_key() -> str:
+    # Vercel overwrites X-Forwarded-For with the real client address.
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    return forwarded.split(',')[0].strip() or request.remote_addr or 'unknown'
+
+def rate_limit_response(cost: float = 1):
+    wait = RATE_LIMITER.take(client_key(), cost)
+    return too_many_response(wait, cost) if wait else None
+
+def too_many_response(wait: float, cost: float):
+    METRICS.inc("rate_limited_total", endpoint=request.endpoint)
+    if wait == math.inf:
+        response = jsonify({"error": f"This request needs {math.ceil(cost)} new summaries; at most {RATE_LIMITER.burst:g} can be generated at once"})
+        response.status_code = 429
+        return response
+    seconds = math.ceil(wait)
+    response = jsonify({"error": f"Too many summary requests; try again in {seconds}s", "retryAfter": seconds})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+# Output caps per length setting, so a runaway "deep" answer cannot take minutes.
+MAX_TOKENS = {"brief": 700, "standard": 1400, "deep": 3000}
+# Upper bound on list items per length, matching length_guidance.
+LIST_ITEMS = {"brief": 3, "standard": 5, "deep": 8}
+
+def completion_params(base_prompt: str, user_prompt: str, length: str) -> dict:
+    # The static schema and guidelines form a byte-identical system prefix for every
+    # request of a kind, so upstream prompt caching can reuse it; only the short
+    # per-request part varies. JSON mode guarantees a parseable object.
+    return {
+        "model": MODEL,
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS.get(length, MAX_TOKENS["standard"]),
+        "response_format": {"type": "json_object"},
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT + "\n\n" + base_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    }
+
+class TokenUsage:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.kinds = {}
+
+    def record(self, kind_name: str, usage) -> dict:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        tokens = {
+            "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+            "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+            "cached_prompt_tokens": getattr(details, 'cached_tokens', 0) or 0,
+        }
+        with self.lock:
+            totals = self.kinds.setdefault(kind_name, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0})
+            totals["requests"] += 1
+            for k, v in tokens.items():
+                totals[k] += v
+        return tokens
+
+    def stats(self):
+        with self.lock:
+            return {k: dict(v) for k, v in self.kinds.items()}
+
+TOKEN_USAGE = TokenUsage()
+
+def token_headers(response, tokens: dict):
+    response.headers['X-Prompt-Tokens'] = str(tokens["prompt_tokens"])
+    response.headers['X-Completion-Tokens'] = str(tokens["completion_tokens"])
+    response.headers['X-Cached-Prompt-Tokens'] = str(tokens["cached_prompt_tokens"])
+    return response
+
+def normalize_text(text: str) -> str:
+    # isascii() is a constant-time flag check, so the common all-ASCII completion
+    # skips the scan entirely; otherwise only characters actually present are replaced.
+    if text.isascii():
+        return text
+    for k, v in NORMALIZE_REPLACEMENTS.items():
+        if k in text:
+            text = text.replace(k, v)
+    return text
+
+def parse_summary_text(kind, text: str) -> dict:
+    return kind.validate(json.loads(normalize_text(text)))
+
+class TruncatedSummary(ValueError):
+    pass
+
+def check_finish(choice, params: dict):
+    if getattr(choice, 'finish_reason', None) == 'length':
+        raise TruncatedSummary(f"AI response hit the {params['max_tokens']}-token limit before finishing")
+
+def summary_future(kind, cache_key: str, params: dict, queue_timeout=UPSTREAM_QUEUE_TIMEOUT):
+    # Resolves to (result, tokens, timer); tokens and stage timings describe the one
+    # upstream call, which coalesced callers share.
+    async def produce():
+        timer = StageTimer()
+        response = await DISPATCHER.complete(timer=timer, queue_timeout=queue_timeout, **params)
+        tokens = TOKEN_USAGE.record(kind.name, getattr(response, 'usage', None))
+        choice = response.choices[0]
+        check_finish(choice, params)
+        text = normalize_text(choice.message.content)
+        timer.mark('normalize')
+        data = json.loads(text)
+        timer.mark('parse')
+        result = kind.validate(data)
+        timer.mark('validate')
+        await asyncio.to_thread(SUMMARY_CACHE.set, cache_key, result)
+        timer.mark('cache_write')
+        return result, tokens, timer
+    return DISPATCHER.submit(cache_key, produce)
+
+def generate_summary(kind, cache_key: str, params: dict):
+    return summary_future(kind, cache_key, params).result(UPSTREAM_TIMEOUT)
+
+# STREAMING
+# `?stream=1` on any summarize endpoint switches to server-sent events. Top-level
+# fields are sent as soon as their JSON value closes, and array fields also send
+# each element as it completes, so the page can render while the model is still
+# writing the rest of the object.
+def wants_stream() -> bool:
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+class JSONFieldStream:
+    # With a schema, only the kind's own fields are reported, coerced the way
+    # SummaryKind.validate coerces the final object, so the page never sees a string
+    # where it expects a list.
+    def __init__(self, schema=None):
+        self.schema = schema
+        self.buf = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+        self.in_array = False
+        self.item_start = None
+        self.item_index = 0
+
+    def feed(self, chunk):
+        events = []
+        self.buf += chunk
+        buf = self.buf
+        for i in range(self.pos, len(buf)):
+            c = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.expect_key:
+                        self.key = json.loads(buf[self.key_start:i + 1])
+                continue
+            if c.isspace():
+                continue
+            if self.depth == 1:
+                if self.expect_key:
+                    if c == '"':
+                        self.in_string = True
+                        self.key_start = i
+                    elif c == ':':
+                        self.expect_key = False
+                        self.value_start = None
+                    elif c == '}':
+                        self.depth = 0
+                    continue
+                if c in ',}':
+                    self._emit_field(events, buf[self.value_start:i])
+                    self.expect_key = True
+                    if c == '}':
+                        self.depth = 0
+                    continue
+                if self.value_start is None:
+                    self.value_start = i
+            elif self.depth == 2 and self.in_array:
+                if c in ',]':
+                    if self.item_start is not None:
+                        self._emit_item(events, buf[self.item_start:i])
+                    if c == ']':
+                        self.in_array = False
+                        self.depth = 1
+                    continue
+                if self.item_start is None:
+                    self.item_start = i
+            if c == '"':
+                self.in_string = True
+            elif c in '{[':
+                self.depth += 1
+                if self.depth == 1:
+                    self.expect_key = True
+                elif self.depth == 2 and c == '[':
+                    self.in_array = True
+                    self.item_start = None
+                    self.item_index = 0
+            elif c in '}]':
+                self.depth -= 1
+        self.pos = len(buf)
+        return events
+
+    def _emit_field(self, events, raw):
+        self.value_start = None
+        expected = self.schema.get(self.key) if self.schema is not None else None
+        if self.schema is not None and expected is None:
+            return
+        try:
+            value = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return
+        events.append(('field', {"key": self.key, "value": coerce_field(expected, value) if expected else value}))
+
+    def _emit_item(self, events, raw):
+        self.item_start = None
+        if self.schema is not None and self.schema.get(self.key) is not list:
+            return
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        if value is None:
+            # validate() drops nulls, so they do not take an index either.
+            return
+        events.append(('item', {"key": self.key, "index": self.item_index, "value": value if isinstance(value, str) else json.dumps(value)}))
+        self.item_index += 1
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    return Response(events, mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+def replay_events(result: dict):
+    for key, value in result.items():
+        yield sse_event('field', {"key": key, "value": value})
+    yield sse_event('done', result)
+
+def stream_summary(kind, cache_key, params, cached=None):
+    def generate():
+        if cached is not None:
+            yield from replay_events(cached)
+            return
+        try:
+            pending = DISPATCHER.pending(cache_key)
+            if pending is not None:
+                # The same summary is already being generated without streaming.
+                with DISPATCHER.lock:
+                    DISPATCHER.coalesced += 1
+                yield from replay_events(pending.result(UPSTREAM_TIMEOUT)[0])
+                return
+            started = time.perf_counter()
+            first_content = None
+            stream, leader = DISPATCHER.stream(cache_key, stream_options={"include_usage": True}, **params)
+            parser = JSONFieldStream(kind.schema)
+            parts = []
+            for chunk in stream:
+                usage = getattr(chunk, 'usage', None)
+                if usage:
+                    # Subscribers share one call; only its starter records the tokens.
+                    tokens = TOKEN_USAGE.record(kind.name, usage) if leader else None
+                    if tokens:
+                        yield sse_event('usage', tokens)
+                if not chunk.choices:
+                    continue
+                check_finish(chunk.choices[0], params)
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first_content is None:
+                    first_content = time.perf_counter()
+                    METRICS.observe("summary_stream_first_token_seconds", first_content - started, kind=kind.name)
+                delta = normalize_text(delta)
+                parts.append(delta)
+                for event, data in parser.feed(delta):
+                    yield sse_event(event, data)
+            result = kind.validate(json.loads(''.join(parts)))
+            SUMMARY_CACHE.set(cache_key, result)
+            METRICS.observe("summary_stream_duration_seconds", time.perf_counter() - started, kind=kind.name)
+            yield sse_event('done', result)
+        except json.JSONDecodeError as e:
+            METRICS.inc("summary_errors_total", kind=kind.name, type=error_type(e))
+            yield sse_event('error', {"error": f"Invalid JSON from AI: {str(e)}"})
+        except Exception as e:
+            METRICS.inc("summary_errors_total", kind=kind.name, type=error_type(e))
+            yield sse_event('error', error_payload(e))
+    return sse_response(generate())
+
+# WARM-UP
+# After the first response has gone out, a daemon thread builds the OpenAI client
+# and loads the talks, so the first summarize or talks request on a fresh instance
+# does not pay for them. Both loaders are idempotent and lock-protected, so a
+# request that races the warm-up just waits for the same load. WARMUP=0 disables it.
+WARMUP = os.getenv("WARMUP", "1") != "0"
+_WARMUP_STARTED = threading.Event()
+
+def warm_up():
+    started = time.perf_counter()
+    for name, load in (("openai_client", get_client), ("talks", talk_data)):
+        try:
+            load()
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+    METRICS.observe("warm_up_seconds", time.perf_counter() - started)
+
+@app.after_request
+def schedule_warm_up(response):
+    if WARMUP and not _WARMUP_STARTED.is_set():
+        _WARMUP_STARTED.set()
+        response.call_on_close(lambda: threading.Thread(target=warm_up, name='warm-up', daemon=True).start())
+    return response
 
 @app.route('/')
 def home():
@@ -247,243 +2272,1197 @@ def home():
 
 @app.route('/api/canons')
 def get_canons():
-    return jsonify(CANONS)
+    return static_json('canons', CANONS)
+
+def wants_ndjson() -> bool:
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+
+def ndjson_response(store, row_ids):
+    # One talk per line, serialized and flushed in batches; gzip-compressed on the
+    # fly when the client accepts it.
+    def lines():
+        for start in range(0, len(row_ids), NDJSON_BATCH_ROWS):
+            batch = row_ids[start:start + NDJSON_BATCH_ROWS]
+            yield ''.join(app.json.dumps(row) + '\n' for row in store.rows(batch)).encode('utf-8')
+    def gzipped():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in lines():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    # Only gzip is used for streams; brotli is kept for buffered bodies.
+    use_gzip = len(row_ids) > 0 and request.accept_encodings.quality('gzip') > 0
+    response = Response(gzipped() if use_gzip else lines(), mimetype='application/x-ndjson')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Accept')
+    return response
 
 @app.route('/api/talks')
 def get_talks():
-    return jsonify(TALKS)
+    # The whole list by default; ?limit, ?offset and ?cursor page through it the same
+    # way as the other talk routes, and ?format=ndjson streams one talk per line.
+    talks = talk_data()
+    store = talks.store
+    paged = any(arg in request.args for arg in ('limit', 'offset', 'cursor'))
+    if not paged and not wants_ndjson():
+        return conditional_json(*talks.all_body, static=True)
+    
+    try:
+        if paged:
+            offset, limit, cursor = page_args(TALKS_DEFAULT_LIMIT, TALKS_MAX_LIMIT)
+        else:
+            offset, limit, cursor = page_args(len(store), len(store))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    start = cursor + 1 if cursor is not None else offset
+    stop = min(len(store), start + limit)
+    row_ids = range(min(start, stop), stop)
+    next_cursor = str(stop - 1) if stop < len(store) and len(row_ids) else ''
+    
+    if wants_ndjson():
+        response = ndjson_response(store, row_ids)
+    else:
+        response = conditional_json(*json_body(store.rows(row_ids)))
+    response.headers['X-Total-Count'] = str(len(store))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/api/talks/search')
 def search_talks():
-    query = request.args.get('q', '').lower().strip()
+    query = request.args.get('q', '').strip()
+    try:
+        offset, limit, _ = page_args(50, SEARCH_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    talks = talk_data()
+    store = talks.store
     if not query:
-        return jsonify(TALKS[:50])
+        response = jsonify(store.rows(range(offset, min(offset + limit, len(store)))))
+        response.headers['X-Total-Count'] = str(len(store))
+        return response
     
-    results = []
-    for talk in TALKS:
-        title = talk.get('title', '').lower()
-        speaker = talk.get('speaker', '').lower()
-        if query in title or query in speaker:
-            results.append(talk)
+    ranked = talks.index.search(query)
+    response = jsonify(store.rows(ranked[offset:offset + limit]))
+    response.headers['X-Total-Count'] = str(len(ranked))
+    return response
+
+@app.route('/api/talks/semantic')
+def semantic_talks():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    try:
+        offset, limit, _ = page_args(20, SEARCH_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    talks = talk_data()
+    try:
+        index = talks.semantic
+    except ImportError:
+        return jsonify({"error": "Semantic search requires numpy"}), 503
     
-    return jsonify(results[:50])
+    hits = index.search(query, offset + limit)[offset:]
+    results = talks.store.rows(doc_id for doc_id, _ in hits)
+    for talk, (_, score) in zip(results, hits):
+        talk["score"] = round(score, 4)
+    return jsonify(results)
 
 @app.route('/api/talks/years')
 def get_talk_years():
-    years = sorted(set(talk.get('year', '') for talk in TALKS if talk.get('year')), reverse=True)
-    return jsonify(years)
+    return conditional_json(*talk_data().facet_bodies["years"], max_age=3600, static=True)
+
+@app.route('/api/talks/speakers')
+def get_talk_speakers():
+    return conditional_json(*talk_data().facet_bodies["speakers"], max_age=3600, static=True)
+
+@app.route('/api/talks/sessions')
+def get_talk_sessions():
+    return conditional_json(*talk_data().facet_bodies["sessions"], max_age=3600, static=True)
 
 @app.route('/api/talks/filter')
 def filter_talks():
-    year = request.args.get('year', '').strip()
-    month = request.args.get('month', '').strip()
-    
-    results = TALKS
+    filters = {field: request.args.get(field, '').strip() for field in FACET_FIELDS}
+    query = request.args.get('q', '').strip()
+    try:
+        _, limit, cursor = page_args(FILTER_DEFAULT_LIMIT, FILTER_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    if year:
-        results = [t for t in results if t.get('year', '') == year]
+    talks = talk_data()
+    cache_key = (tuple(facet_value(f, v) for f, v in filters.items()), fold_text(query), cursor, limit)
+    with talks.filter_lock:
+        cached = talks.filter_cache.get(cache_key)
+        if cached is not None:
+            talks.filter_cache.move_to_end(cache_key)
     
-    if month:
-        results = [t for t in results if t.get('month', '').lower() == month.lower()]
+    if cached is None:
+        ids = talks.facets.match(filters)
+        if query:
+            hits = set(talks.index.search(query))
+            ids = sorted(hits) if ids is None else [i for i in ids if i in hits]
+        elif ids is None:
+            ids = range(len(talks.store))
+        
+        # The cursor is the last row id of the previous page; ids are ascending.
+        start = bisect.bisect_right(ids, cursor) if cursor is not None else 0
+        page = ids[start:start + limit]
+        next_cursor = str(page[-1]) if start + limit < len(ids) else ''
+        body, etag = json_body(talks.store.rows(page))
+        cached = (body, etag, next_cursor, len(ids))
+        with talks.filter_lock:
+            talks.filter_cache[cache_key] = cached
+            while len(talks.filter_cache) > FILTER_CACHE_ENTRIES:
+                talks.filter_cache.popitem(last=False)
     
-    return jsonify(results[:100])
+    body, etag, next_cursor, total = cached
+    response = conditional_json(body, etag)
+    response.headers['X-Total-Count'] = str(total)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
-@app.route('/api/summarize/scripture', methods=['POST'])
-def summarize_scripture():
-    if not client:
-        return jsonify({"error": "OpenAI client not configured"}), 500
-    
-    try:
-        data = request.json
-        reference = data.get('reference', '').strip()
-        focus = data.get('focus', '').strip()
-        length = data.get('length', 'standard')
-        
-        if not reference:
-            return jsonify({"error": "No reference provided"}), 400
+# SCRIPTURE REFERENCES
+# "alma 32", "Alma ch. 32" and "Alma 32" are the same request. References are parsed
+# against a lookup table built once from CANONS (full names, the standard
+# abbreviations and unambiguous prefixes), checked against the chapter counts, and
+# rewritten to one canonical form before they reach the prompt or the cache key.
+# Text that does not name a book passes through untouched, so themes still work.
+BOOK_ABBREVIATIONS = {
+    "1 Nephi": ["1 Ne"], "2 Nephi": ["2 Ne"], "Jacob": ["Jac"], "Enos": ["En"],
+    "Jarom": ["Jar"], "Words of Mormon": ["W of M", "WoM"], "Helaman": ["Hel"],
+    "3 Nephi": ["3 Ne"], "4 Nephi": ["4 Ne"], "Mormon": ["Morm"], "Moroni": ["Moro"],
+    "Genesis": ["Gen"], "Exodus": ["Ex", "Exod"], "Leviticus": ["Lev"], "Numbers": ["Num"],
+    "Deuteronomy": ["Deut"], "Joshua": ["Josh"], "Judges": ["Judg"], "1 Samuel": ["1 Sam"],
+    "2 Samuel": ["2 Sam"], "1 Kings": ["1 Kgs"], "2 Kings": ["2 Kgs"], "1 Chronicles": ["1 Chr"],
+    "2 Chronicles": ["2 Chr"], "Nehemiah": ["Neh"], "Esther": ["Esth"], "Psalms": ["Ps", "Psalm"],
+    "Proverbs": ["Prov"], "Ecclesiastes": ["Eccl"], "Song of Solomon": ["Song", "Song of Songs"],
+    "Isaiah": ["Isa"], "Jeremiah": ["Jer"], "Lamentations": ["Lam"], "Ezekiel": ["Ezek"],
+    "Daniel": ["Dan"], "Obadiah": ["Obad"], "Habakkuk": ["Hab"], "Zephaniah": ["Zeph"],
+    "Haggai": ["Hag"], "Zechariah": ["Zech"], "Malachi": ["Mal"], "Matthew": ["Matt", "Mt"],
+    "Mark": ["Mk"], "Luke": ["Lk"], "John": ["Jn"], "Romans": ["Rom"], "1 Corinthians": ["1 Cor"],
+    "2 Corinthians": ["2 Cor"], "Galatians": ["Gal"], "Ephesians": ["Eph"],
+    "Philippians": ["Philip", "Phil"], "Colossians": ["Col"], "1 Thessalonians": ["1 Thes", "1 Thess"],
+    "2 Thessalonians": ["2 Thes", "2 Thess"], "1 Timothy": ["1 Tim"], "2 Timothy": ["2 Tim"],
+    "Philemon": ["Philem"], "Hebrews": ["Heb"], "James": ["Jas"], "1 Peter": ["1 Pet"],
+    "2 Peter": ["2 Pet"], "1 John": ["1 Jn"], "2 John": ["2 Jn"], "3 John": ["3 Jn"],
+    "Revelation": ["Rev", "Revelations"],
+    "Doctrine and Covenants": ["D&C", "DC", "D and C", "Doctrine & Covenants"],
+    "Abraham": ["Abr"], "Joseph Smith-Matthew": ["JS-M", "JSM", "Joseph Smith Matthew"],
+    "Joseph Smith-History": ["JS-H", "JSH", "Joseph Smith History"],
+    "Articles of Faith": ["A of F", "AoF"],
+}
+BOOK_PREFIX_MIN = 3
+# Ranges up to this many chapters are summarized chapter by chapter and composed;
+# longer ones ("3 Ne 11-30") get one summary of the whole range, as they always have.
+SCRIPTURE_SPLIT_MAX_CHAPTERS = 10
+ORDINAL_RE = re.compile(r"^(first|1st|i|second|2nd|ii|third|3rd|iii|fourth|4th|iv)\s+")
+ORDINALS = {"first": "1", "1st": "1", "i": "1", "second": "2", "2nd": "2", "ii": "2",
+            "third": "3", "3rd": "3", "iii": "3", "fourth": "4", "4th": "4", "iv": "4"}
+REFERENCE_RE = re.compile(
+    r"^(?P<book>.*?[a-z].*?)\s*(?:(?:chapter|chap|ch|section|sec)\.?\s*)?"
+    r"(?P<start>\d+)(?:[:.]\s*(?P<verse>\d+)(?:\s*(?:-|to)\s*(?:(?P<end_chapter>\d+)[:.])?(?P<end_verse>\d+))?)?"
+    r"(?:\s*(?:-|to)\s*(?P<end>\d+))?$"
+)
+
+def book_key(name: str) -> str:
+    # "1st Ne." -> "1ne", "D&C" -> "dandc", "JS—H" -> "jsh"
+    text = fold_text(name).replace('&', ' and ').strip()
+    text = ORDINAL_RE.sub(lambda m: ORDINALS[m.group(1)] + ' ', text)
+    return re.sub(r"[^a-z0-9]", "", text)
+
+def build_book_lookup() -> dict:
+    lookup, prefixes = {}, {}
+    for canon in CANONS:
+        for book in canon["books"]:
+            entry = (canon["key"], book)
+            for name in [book["name"]] + BOOK_ABBREVIATIONS.get(book["name"], []):
+                lookup[book_key(name)] = entry
+            key = book_key(book["name"])
+            for n in range(BOOK_PREFIX_MIN, len(key)):
+                prefixes.setdefault(key[:n], set()).add(book["name"])
+    for canon in CANONS:
+        for book in canon["books"]:
+            key = book_key(book["name"])
+            for n in range(BOOK_PREFIX_MIN, len(key)):
+                if len(prefixes[key[:n]]) == 1:
+                    lookup.setdefault(key[:n], (canon["key"], book))
+    return lookup
+
+BOOK_LOOKUP = build_book_lookup()
+
+def parse_reference(text: str):
+    # Returns a dict with canon, book, start/end chapter and an optional verse span,
+    # or None when the text does not name a book. Raises BadSummaryRequest for a
+    # known book with an impossible chapter or verse.
+    if not isinstance(text, str):
+        return None
+    folded = re.sub(r"\s*[‐-―-]\s*", "-", fold_text(text).strip())
+    match = REFERENCE_RE.match(folded)
+    if match:
+        found = BOOK_LOOKUP.get(book_key(match.group('book')))
+    else:
+        found = BOOK_LOOKUP.get(book_key(folded))
+        if found is None or found[1]["chapters"] != 1:
+            return None
+        return {"canon": found[0], "book": found[1]["name"], "start": 1, "end": 1, "verses": ""}
+    if found is None:
+        return None
+    canon, book = found
+    start = int(match.group('start'))
+    end = int(match.group('end_chapter') or match.group('end') or start)
+    verse, end_verse = match.group('verse'), match.group('end_verse')
+    if book["chapters"] == 1 and not verse and start > 1:
+        # "Jude 3", "A of F 13": a bare number in a one-chapter book is a verse.
+        verse, end_verse, start, end = str(start), str(end), 1, 1
+    if start < 1 or end > book["chapters"]:
+        raise BadSummaryRequest(f"{book['name']} has {book['chapters']} chapter{'s' if book['chapters'] != 1 else ''}")
+    if end < start:
+        raise BadSummaryRequest(f"Invalid range in {text!r}")
+    verses = ""
+    if verse:
+        first, last = int(verse), int(end_verse or verse)
+        if first < 1 or (end == start and last < first):
+            raise BadSummaryRequest(f"Invalid verses in {text!r}")
+        if match.group('end_chapter'):
+            verses = f"{first}-{end}:{last}"
+        else:
+            verses = f"{first}-{last}" if last != first else str(first)
+    return {"canon": canon, "book": book["name"], "start": start, "end": end, "verses": verses}
+
+def format_reference(ref: dict) -> str:
+    if ref["verses"]:
+        return f"{ref['book']} {ref['start']}:{ref['verses']}"
+    if ref["end"] != ref["start"]:
+        return f"{ref['book']} {ref['start']}-{ref['end']}"
+    return f"{ref['book']} {ref['start']}"
+
+def normalize_scripture(values: dict) -> dict:
+    ref = parse_reference(values.get('reference', ''))
+    if ref is None:
+        return values
+    return dict(values, reference=format_reference(ref))
+
+def scripture_units(data: dict):
+    # "Mosiah 2-5" becomes four chapter requests, cached one by one so they are
+    # shared with single-chapter lookups and with overlapping ranges.
+    ref = parse_reference(data.get('reference', ''))
+    if ref is None or ref["verses"] or ref["end"] == ref["start"]:
+        return None
+    if ref["end"] - ref["start"] + 1 > SCRIPTURE_SPLIT_MAX_CHAPTERS:
+        return None
+    return format_reference(ref), [dict(data, reference=chapter) for chapter in reference_chapters(ref)]
+
+def reference_chapters(ref: dict) -> list:
+    return [f"{ref['book']} {chapter}" for chapter in range(ref["start"], ref["end"] + 1)]
+
+# SUMMARY KINDS
+# One registry entry per study mode. The response schema is read from the
+# "Return JSON in this exact shape" block of the BASE_PROMPT, so the prompt stays
+# the single source of truth; adding a mode means adding a prompt and an entry.
+SCHEMA_FIELD_RE = re.compile(r'^\s*"(\w+)": (string\[\]|string)', re.M)
+
+class BadSummaryRequest(Exception):
+    pass
+
+def text_field(data: dict, name: str) -> str:
+    # A request field that must be text; missing and null both read as ''.
+    value = data.get(name) or ''
+    if not isinstance(value, str):
+        raise BadSummaryRequest(f"{name} must be a string")
+    return value
+
+class SummaryKind:
+    def __init__(self, name, base_prompt, inputs, required, missing_error, header="Now respond for:\n", trailer="", context=None,
+                 normalize=None, split=None):
+        self.name = name
+        self.base_prompt = base_prompt
+        self.inputs = inputs
+        self.required = required
+        self.missing_error = missing_error
+        self.header = header
+        self.trailer = trailer
+        self.context = context
+        self.normalize = normalize
+        self.split = split
+        self.schema = {
+            m.group(1): list if m.group(2).endswith('[]') else str
+            for m in SCHEMA_FIELD_RE.finditer(base_prompt)
+        }
+
+    def build(self, data: dict):
+        # Validates one request's input and returns (cache_key, completion params).
+        length = summary_length(data.get('length'))
+        data = dict(data, length=length)
+        values = {name: text_field(data, name).strip() for name, _ in self.inputs}
+        if any(not values[name] for name in self.required):
+            raise BadSummaryRequest(self.missing_error)
+        if self.normalize:
+            values = self.normalize(values)
         
+        context = self.context(values, data) if self.context else ''
+        key_inputs = dict(values, length=length)
+        if context:
+            key_inputs["context"] = hashlib.sha256(context.encode('utf-8')).hexdigest()
+        cache_key = summary_cache_key(self.name, self.template(length), key_inputs)
+        return cache_key, self.prompt(values, length, context)
+
+    def prompt(self, values: dict, length: str, context: str) -> dict:
         user_prompt = (
-            BASE_PROMPT_SCRIPTURE
-            + "\n\nNow respond for:\n"
-            + f"REFERENCE: {reference}\n"
-            + f"FOCUS: {focus}\n"
+            self.header
+            + "".join(f"{label}: {values[name]}\n" for name, label in self.inputs)
             + f"LENGTH REQUIREMENT: {length_guidance(length)}\n"
-            + "AUDIENCE: general\n"
-        )
-        
-        response = client.chat.completions.create(
-            model=MODEL,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "Return only a valid JSON object that matches the schema. No prose outside JSON."},
-                {"role": "user", "content": user_prompt}
-            ]
+            + self.trailer
+            + context
         )
-        
-        text = response.choices[0].message.content
-        replacements = {"\u2019":"'","\u201C":'"',"\u201D":'"',"\u2013":"-","\u2014":"-"}
-        for k, v in replacements.items():
-            text = text.replace(k, v)
-        
-        result = json.loads(text)
-        return jsonify(result)
-        
-    except json.JSONDecodeError as e:
-        return jsonify({"error": f"Invalid JSON from AI: {str(e)}"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return completion_params(self.base_prompt, user_prompt, length)
 
-@app.route('/api/summarize/talk', methods=['POST'])
-def summarize_talk():
-    if not client:
+    def template(self, length: str) -> dict:
+        # The request as sent, with each input and the context replaced by a placeholder.
+        return self.prompt({name: "{" + name + "}" for name, _ in self.inputs}, length, "{context}")
+
+    def compose(self, label: str, unit_labels: list, results: list, length: str) -> dict:
+        # Joins per-unit results (the chapters of a range) into one object of the same
+        # shape: text fields are prefixed with each unit's label, lists are interleaved
+        # so every unit is represented, then capped. The parts stay under "units".
+        label_field = next(iter(self.schema))
+        limit = max(LIST_ITEMS.get(length, LIST_ITEMS["standard"]), len(results))
+        composed = {}
+        for field, expected in self.schema.items():
+            if field == label_field:
+                composed[field] = label
+            elif expected is list:
+                merged = []
+                for group in itertools.zip_longest(*(r.get(field) or [] for r in results)):
+                    merged.extend(v for v in group if v is not None and v not in merged)
+                composed[field] = merged[:limit]
+            else:
+                composed[field] = "\n\n".join(f"{u}: {r[field]}" for u, r in zip(unit_labels, results) if r.get(field))
+        composed["units"] = results
+        return composed
+
+    def validate(self, result) -> dict:
+        # Coerces the model output onto the schema: missing fields become empty,
+        # a bare string where a list belongs becomes a one-item list, extras are dropped.
+        if not isinstance(result, dict):
+            raise ValueError("AI response is not a JSON object")
+        return {field: coerce_field(expected, result.get(field)) for field, expected in self.schema.items()}
+
+def coerce_field(expected, value):
+    # Missing fields become empty, a bare value where a list belongs becomes a
+    # one-item list, and anything that is not a string is serialized to one.
+    if expected is list:
+        if value is None:
+            value = []
+        elif not isinstance(value, list):
+            value = [value]
+        return [v if isinstance(v, str) else json.dumps(v) for v in value if v is not None]
+    if not isinstance(value, str):
+        return '' if value is None else json.dumps(value)
+    return value
+
+SUMMARY_KINDS = {
+    "scripture": SummaryKind(
+        "scripture", BASE_PROMPT_SCRIPTURE,
+        inputs=(("reference", "REFERENCE"), ("focus", "FOCUS")),
+        required=("reference",), missing_error="No reference provided",
+        trailer="AUDIENCE: general\n", normalize=normalize_scripture, split=scripture_units
+    ),
+    "talk": SummaryKind(
+        "talk", BASE_PROMPT_TALKS,
+        inputs=(("title", "Talk"), ("speaker", "Speaker"), ("focus", "FOCUS")),
+        required=("title",), missing_error="No talk selected", header="", context=talk_context
+    ),
+    "essentials": SummaryKind(
+        "essentials", BASE_PROMPT_ESSENTIALS,
+        inputs=(("topic", "MAIN TOPIC"), ("subtopic", "SUBTOPIC")),
+        required=("topic", "subtopic"), missing_error="Topic and subtopic required"
+    ),
+    "doctrine": SummaryKind(
+        "doctrine", BASE_PROMPT_DOCTRINE,
+        inputs=(("topic", "MAIN TOPIC"), ("subtopic", "SUBTOPIC")),
+        required=("topic", "subtopic"), missing_error="Topic and subtopic required"
+    ),
+}
+
+def error_type(e: Exception) -> str:
+    if isinstance(e, json.JSONDecodeError):
+        return 'json_decode'
+    if isinstance(e, TruncatedSummary):
+        return 'truncated'
+    if isinstance(e, UpstreamOverloaded):
+        return 'overloaded'
+    status = upstream_status(e)
+    if status == 429:
+        return 'rate_limited'
+    if isinstance(e, TimeoutError) or (status == 0 and 'Timeout' in type(e).__name__):
+        return 'timeout'
+    if status is not None:
+        return 'upstream'
+    return 'internal'
+
+# What a client should do about a failure: back off (429/503), or give up (5xx).
+ERROR_STATUS = {"overloaded": 503, "rate_limited": 429, "timeout": 504, "upstream": 502}
+
+def error_payload(e: Exception) -> dict:
+    payload = {"error": str(e)}
+    retry_after = retry_after_seconds(e)
+    if retry_after is not None:
+        payload["retryAfter"] = math.ceil(retry_after)
+    return payload
+
+def error_response(e: Exception):
+    payload = error_payload(e)
+    response = jsonify(payload)
+    response.status_code = ERROR_STATUS.get(error_type(e), 500)
+    if "retryAfter" in payload:
+        response.headers['Retry-After'] = str(payload["retryAfter"])
+    return response
+
+def summarize(name: str):
+    if not get_client():
         return jsonify({"error": "OpenAI client not configured"}), 500
     
+    kind = SUMMARY_KINDS[name]
+    timer = StageTimer()
     try:
-        data = request.json
-        talk_title = data.get('title', '').strip()
-        talk_speaker = data.get('speaker', '').strip()
-        focus = data.get('focus', '').strip()
-        length = data.get('length', 'standard')
-        
-        if not talk_title:
-            return jsonify({"error": "No talk selected"}), 400
-        
-        context = f"Talk: {talk_title}\nSpeaker: {talk_speaker}"
-        
-        user_prompt = (
-            BASE_PROMPT_TALKS
-            + f"\n\n{context}\n"
-            + f"FOCUS: {focus}\n"
-            + f"LENGTH REQUIREMENT: {length_guidance(length)}\n"
-        )
-        
-        response = client.chat.completions.create(
-            model=MODEL,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "Return only a valid JSON object that matches the schema. No prose outside JSON."},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
+        try:
+            data = request.get_json(silent=True) or {}
+            if not isinstance(data, dict):
+                raise BadSummaryRequest("Expected a JSON object")
+            length = summary_length(data.get('length'))
+            data = dict(data, length=length)
+            split = kind.split(data) if kind.split else None
+            if split is None:
+                cache_key, params = kind.build(data)
+            else:
+                label, units = split
+                jobs = [(unit,) + kind.build(unit) for unit in units]
+        except BadSummaryRequest as e:
+            return jsonify({"error": str(e)}), 400
+        timer.mark('prompt_build')
+        if split is not None:
+            return composed_summary(kind, label, jobs, length, timer)
         
-        text = response.choices[0].message.content
-        replacements = {"\u2019":"'","\u201C":'"',"\u201D":'"',"\u2013":"-","\u2014":"-"}
-        for k, v in replacements.items():
-            text = text.replace(k, v)
+        cached = SUMMARY_CACHE.get(cache_key)
+        timer.mark('cache_lookup')
+        METRICS.inc("summary_cache_lookups_total", kind=name, result='hit' if cached is not None else 'miss')
+        if cached is None:
+            limited = rate_limit_response()
+            if limited is not None:
+                return limited
+        if wants_stream():
+            record_stages(name, length, timer)
+            return stream_summary(kind, cache_key, params, cached)
+        if cached is not None:
+            response = jsonify(cached)
+            timer.mark('serialize')
+            record_stages(name, length, timer)
+            METRICS.observe("summary_duration_seconds", sum(timer.stages.values()), kind=name, length=length, source='cache')
+            return response
         
-        result = json.loads(text)
-        return jsonify(result)
+        result, tokens, upstream = generate_summary(kind, cache_key, params)
+        timer.mark('wait')
+        response = token_headers(jsonify(result), tokens)
+        timer.mark('serialize')
+        # The request thread's "wait" covers the upstream stages; report those instead.
+        timer.stages.pop('wait', None)
+        timer.merge(upstream)
+        record_stages(name, length, timer)
+        METRICS.observe("summary_duration_seconds", sum(timer.stages.values()), kind=name, length=length, source='upstream')
+        return response
         
     except json.JSONDecodeError as e:
+        METRICS.inc("summary_errors_total", kind=name, type=error_type(e))
         return jsonify({"error": f"Invalid JSON from AI: {str(e)}"}), 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        METRICS.inc("summary_errors_total", kind=name, type=error_type(e))
+        return error_response(e)
+
+def cached_future(result: dict):
+    # A future already resolved the way summary_future resolves, for cache hits.
+    future = concurrent.futures.Future()
+    future.set_result((result, None, None))
+    return future
+
+def unit_futures(kind, jobs: list, cached: list) -> list:
+    # Cached units resolve immediately; the rest go upstream concurrently.
+    return [
+        summary_future(kind, key, params) if hit is None else cached_future(hit)
+        for (unit, key, params), hit in zip(jobs, cached)
+    ]
+
+def composed_summary(kind, label: str, jobs: list, length: str, timer):
+    unit_labels = [unit[kind.inputs[0][0]] for unit, _, _ in jobs]
+    cached = [SUMMARY_CACHE.get(key) for _, key, _ in jobs]
+    missing = sum(result is None for result in cached)
+    if missing:
+        limited = rate_limit_response(missing)
+        if limited is not None:
+            return limited
+    futures = unit_futures(kind, jobs, cached)
+    timer.mark('cache_lookup')
+    if wants_stream():
+        record_stages(kind.name, length, timer)
+        def generate():
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(futures, UPSTREAM_TIMEOUT), 1):
+                    yield sse_event('unit', {"done": done, "total": len(futures), "value": future.result()[0]})
+                yield sse_event('done', kind.compose(label, unit_labels, [f.result()[0] for f in futures], length))
+            except json.JSONDecodeError as e:
+                METRICS.inc("summary_errors_total", kind=kind.name, type=error_type(e))
+                yield sse_event('error', {"error": f"Invalid JSON from AI: {str(e)}"})
+            except Exception as e:
+                METRICS.inc("summary_errors_total", kind=kind.name, type=error_type(e))
+                yield sse_event('error', error_payload(e))
+        return sse_response(generate())
+    
+    results = []
+    tokens = {"prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0}
+    for future in futures:
+        result, unit_tokens, _ = future.result(UPSTREAM_TIMEOUT)
+        results.append(result)
+        for k, v in (unit_tokens or {}).items():
+            tokens[k] += v
+    timer.mark('wait')
+    response = token_headers(jsonify(kind.compose(label, unit_labels, results, length)), tokens)
+    timer.mark('serialize')
+    record_stages(kind.name, length, timer)
+    METRICS.observe("summary_duration_seconds", sum(timer.stages.values()), kind=kind.name, length=length, source='composed')
+    return response
+
+@app.route('/api/summarize/scripture', methods=['POST'])
+def summarize_scripture():
+    return summarize('scripture')
+
+@app.route('/api/summarize/talk', methods=['POST'])
+def summarize_talk():
+    return summarize('talk')
 
 @app.route('/api/health')
 def health():
+    # Reports what is loaded without loading it, so a probe on a cold instance
+    # stays cheap; talks_loaded is 0 until a talks endpoint or the warm-up runs.
+    talks = _TALK_DATA
     return jsonify({
         "status": "ok", 
-        "openai_configured": client is not None, 
-        "talks_loaded": len(TALKS)
+        "openai_configured": client_configured(),
+        "openai_loaded": _CLIENT is not None,
+        "talks_loaded": len(talks.store) if talks is not None else 0,
+        "semantic_loaded": talks is not None and talks._semantic is not None,
+        "summary_cache": SUMMARY_CACHE.stats(),
+        "upstream": DISPATCHER.stats(),
+        "tokens": TOKEN_USAGE.stats()
     })
 
+# Talk ingestion for long-running deployments. Disabled unless ADMIN_TOKEN is set;
+# on serverless hosts each instance holds its own copy, so new talks should also
+# be added to data/talks.csv (python api/index.py ingest-talks) and deployed.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def admin_error():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {ADMIN_TOKEN}".encode('utf-8')):
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+@app.route('/api/admin/talks', methods=['POST'])
+def admin_ingest_talks():
+    error = admin_error()
+    if error:
+        return error
+    if request.mimetype == 'text/csv':
+        talks = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    else:
+        data = request.get_json(silent=True)
+        talks = data.get('talks') if isinstance(data, dict) else data
+    if not isinstance(talks, list):
+        return jsonify({"error": "Send a JSON list of talks, {\"talks\": [...]}, or text/csv"}), 400
+    
+    persist = request.args.get('persist') == '1'
+    try:
+        counts = ingest_talks(talks, TALKS_CSV_PATH if persist else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except OSError as e:
+        return jsonify({"error": f"Talks were loaded but not saved: {e}"}), 500
+    METRICS.inc("talks_ingested_total", counts["added"])
+    return jsonify(counts)
+
+@app.route('/api/admin/talks/reload', methods=['POST'])
+def admin_reload_talks():
+    # Full rebuild from disk, for edits that are not plain additions.
+    error = admin_error()
+    if error:
+        return error
+    with _TALK_LOAD_LOCK:
+        data = load_talks()
+    return jsonify({"total": len(data.store)})
+
+@app.route('/api/metrics')
+def metrics():
+    extra = []
+    for kind_name, totals in TOKEN_USAGE.stats().items():
+        for field in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens"):
+            extra.append((("openai_tokens_total", (("kind", kind_name), ("type", field))), totals[field]))
+        extra.append((("openai_requests_total", (("kind", kind_name),)), totals["requests"]))
+    cache = SUMMARY_CACHE.stats()
+    extra.append((("summary_cache_hits_total", ()), cache["hits"]))
+    extra.append((("summary_cache_misses_total", ()), cache["misses"]))
+    upstream = DISPATCHER.stats()
+    extra.append((("upstream_coalesced_total", ()), upstream["coalesced"]))
+    gauges = [
+        (("upstream_concurrency_limit", ()), upstream["limit"]),
+        (("upstream_active", ()), upstream["active"]),
+        (("upstream_queue_depth", ()), upstream["queued"]),
+    ]
+    return Response(METRICS.render(extra, gauges), mimetype='text/plain; version=0.0.4')
+
 
 
 @app.route('/api/gospel-essentials')
 def get_gospel_essentials():
-    return jsonify(GOSPEL_ESSENTIALS)
+    return static_json('gospel-essentials', GOSPEL_ESSENTIALS)
 
 @app.route('/api/summarize/essentials', methods=['POST'])
 def summarize_essentials():
-    if not client:
-        return jsonify({"error": "OpenAI client not configured"}), 500
-    
-    try:
-        data = request.json
-        topic = data.get('topic', '').strip()
-        subtopic = data.get('subtopic', '').strip()
-        length = data.get('length', 'standard')
-        
-        if not topic or not subtopic:
-            return jsonify({"error": "Topic and subtopic required"}), 400
-        
-        user_prompt = (
-            BASE_PROMPT_ESSENTIALS
-            + "\n\nNow respond for:\n"
-            + f"MAIN TOPIC: {topic}\n"
-            + f"SUBTOPIC: {subtopic}\n"
-            + f"LENGTH REQUIREMENT: {length_guidance(length)}\n"
-        )
-        
-        response = client.chat.completions.create(
-            model=MODEL,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "Return only a valid JSON object that matches the schema. No prose outside JSON."},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        
-        text = response.choices[0].message.content
-        replacements = {"\u2019":"'","\u201C":'"',"\u201D":'"',"\u2013":"-","\u2014":"-"}
-        for k, v in replacements.items():
-            text = text.replace(k, v)
-        
-        result = json.loads(text)
-        return jsonify(result)
-        
-    except json.JSONDecodeError as e:
-        return jsonify({"error": f"Invalid JSON from AI: {str(e)}"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return summarize('essentials')
 
 @app.route('/api/deep-doctrine')
 def get_deep_doctrine():
-    return jsonify(DEEP_DOCTRINE)
+    return static_json('deep-doctrine', DEEP_DOCTRINE)
 
 @app.route('/api/summarize/doctrine', methods=['POST'])
 def summarize_doctrine():
-    if not client:
+    return summarize('doctrine')
+
+# BATCH SUMMARIES
+# Expands books and topic lists into individual summary jobs. Jobs whose result is
+# already in SUMMARY_CACHE are skipped, so re-running an interrupted batch only
+# pays for what is missing, and interactive requests afterwards are pure reads.
+# A batch can start hundreds of paid completions, so the endpoint is an admin
+# one (ADMIN_TOKEN) like talk ingestion; the prewarm CLI needs no token.
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+def find_book(name: str):
+    found = BOOK_LOOKUP.get(book_key(name))
+    return found[1] if found else None
+
+def find_topics(topics: list, name: str) -> list:
+    if not name:
+        return topics
+    wanted = normalize_input(name)
+    return [t for t in topics if normalize_input(t["topic"]) == wanted]
+
+BATCH_TEXT_FIELDS = ("kind", "reference", "book", "topic", "subtopic", "title", "speaker", "url", "focus")
+
+def expand_batch_item(item: dict) -> list:
+    for field in BATCH_TEXT_FIELDS:
+        text_field(item, field)
+    kind = item.get('kind') or 'scripture'
+    if kind == 'scripture':
+        if item.get('reference'):
+            # Every chapter of a range is its own job here; the job limits bound the total.
+            ref = parse_reference(item['reference'])
+            if ref is None or ref["verses"]:
+                return [{"reference": item['reference']}]
+            return [{"reference": chapter} for chapter in reference_chapters(ref)]
+        book = find_book(item.get('book', ''))
+        if not book:
+            raise BadSummaryRequest(f"Unknown book: {item.get('book', '')}")
+        return [{"reference": f"{book['name']} {chapter}"} for chapter in range(1, book["chapters"] + 1)]
+    if kind in ('essentials', 'doctrine'):
+        topics = find_topics(GOSPEL_ESSENTIALS if kind == 'essentials' else DEEP_DOCTRINE, item.get('topic', ''))
+        if not topics:
+            raise BadSummaryRequest(f"Unknown topic: {item.get('topic', '')}")
+        subtopic = item.get('subtopic', '')
+        return [
+            {"topic": t["topic"], "subtopic": sub}
+            for t in topics for sub in ([subtopic] if subtopic else t["subtopics"])
+        ]
+    if kind == 'talk':
+        return [{"title": item.get('title', ''), "speaker": item.get('speaker', ''), "url": item.get('url', '')}]
+    raise BadSummaryRequest(f"Unknown kind: {kind}")
+
+def build_batch_jobs(items: list, lengths: list) -> list:
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise BadSummaryRequest("items must be a list of objects")
+    jobs = []
+    seen = set()
+    for item in items:
+        kind = item.get('kind') or 'scripture'
+        item_lengths = item.get('lengths') or lengths
+        if not isinstance(item_lengths, list):
+            raise BadSummaryRequest("lengths must be a list")
+        for unit in expand_batch_item(item):
+            for length in item_lengths:
+                if length not in SUMMARY_LENGTHS:
+                    raise BadSummaryRequest(f"Unknown length: {length}")
+                data = dict(unit, focus=item.get('focus', ''), length=length)
+                key, params = SUMMARY_KINDS[kind].build(data)
+                if key not in seen:
+                    seen.add(key)
+                    jobs.append({"kind": kind, "input": data, "key": key, "params": params})
+    return jobs
+
+def run_batch(jobs: list, concurrency: int = BATCH_CONCURRENCY):
+    # Yields (job, status, error) as jobs finish; at most `concurrency` are in flight.
+    done = queue.Queue()
+    outstanding = 0
+    def outcome(job, future):
+        try:
+            future.result()
+            return job, 'generated', None
+        except Exception as e:
+            return job, 'error', str(e)
+    for job in jobs:
+        if SUMMARY_CACHE.get(job["key"]) is not None:
+            yield job, 'cached', None
+            continue
+        while outstanding >= concurrency or not done.empty():
+            yield outcome(*done.get())
+            outstanding -= 1
+        # Batch work is already bounded by `concurrency`, so it waits for capacity
+        # behind interactive calls instead of failing on their queue deadline.
+        future = summary_future(SUMMARY_KINDS[job["kind"]], job["key"], job["params"], queue_timeout=None)
+        future.add_done_callback(lambda f, job=job: done.put((job, f)))
+        outstanding += 1
+    while outstanding:
+        yield outcome(*done.get())
+        outstanding -= 1
+
+@app.route('/api/summarize/batch', methods=['POST'])
+def summarize_batch():
+    denied = admin_error()
+    if denied:
+        return denied
+    if not get_client():
         return jsonify({"error": "OpenAI client not configured"}), 500
     
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
     try:
-        data = request.json
-        topic = data.get('topic', '').strip()
-        subtopic = data.get('subtopic', '').strip()
-        length = data.get('length', 'standard')
-        
-        if not topic or not subtopic:
-            return jsonify({"error": "Topic and subtopic required"}), 400
-        
-        user_prompt = (
-            BASE_PROMPT_DOCTRINE
-            + "\n\nNow respond for:\n"
-            + f"MAIN TOPIC: {topic}\n"
-            + f"SUBTOPIC: {subtopic}\n"
-            + f"LENGTH REQUIREMENT: {length_guidance(length)}\n"
-        )
-        
-        response = client.chat.completions.create(
-            model=MODEL,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "Return only a valid JSON object that matches the schema. No prose outside JSON."},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        
-        text = response.choices[0].message.content
-        replacements = {"\u2019":"'","\u201C":'"',"\u201D":'"',"\u2013":"-","\u2014":"-"}
-        for k, v in replacements.items():
-            text = text.replace(k, v)
-        
-        result = json.loads(text)
-        return jsonify(result)
-        
+        jobs = build_batch_jobs(data.get('items', []), data.get('lengths') or ['standard'])
+        concurrency = max(1, min(BATCH_CONCURRENCY, int(data.get('concurrency', BATCH_CONCURRENCY))))
+    except (BadSummaryRequest, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not jobs:
+        return jsonify({"error": "No items provided"}), 400
+    if len(jobs) > BATCH_MAX_JOBS:
+        return jsonify({"error": f"Batch expands to {len(jobs)} summaries; the limit is {BATCH_MAX_JOBS}"}), 400
+    
+    def generate():
+        counts = {"cached": 0, "generated": 0, "error": 0}
+        for finished, (job, status, error) in enumerate(run_batch(jobs, concurrency), 1):
+            counts[status] += 1
+            event = {"done": finished, "total": len(jobs), "status": status, "kind": job["kind"], "input": job["input"]}
+            if error:
+                event["error"] = error
+            yield sse_event('progress', event)
+        yield sse_event('done', dict(counts, total=len(jobs)))
+    return sse_response(generate())
+
+# STUDY PLANS
+# A reading plan ("Mosiah 2-5", every subtopic of a doctrine topic, or a list of
+# batch-style items) expands into the same per-chapter and per-subtopic units the
+# summarize endpoints cache, so a plan reuses what has been studied before and
+# leaves its units behind for later. Cached units are served at once and the rest
+# are generated concurrently, as many as the client's rate limit allows; units past
+# that come back as "pending" for a later request. The synthesis pass sees only a short digest of each
+# unit (label, opening overview, a few themes), never the source material, and
+# writes the overview and one outline per session. `?stream=1` reports each unit
+# as it lands.
+STUDY_PLAN_MAX_UNITS = int(os.getenv("STUDY_PLAN_MAX_UNITS", "30"))
+STUDY_PLAN_MAX_SESSIONS = 14
+DIGEST_TEXT_FIELDS = ("overview", "summary", "explanation")
+DIGEST_LIST_FIELDS = ("themes", "key_messages", "key_scriptures", "key_verses")
+DIGEST_TEXT_CHARS = 400
+DIGEST_LIST_ITEMS = 3
+
+def plan_digest(values: dict, data: dict) -> str:
+    return "UNIT SUMMARIES:\n" + data.get('digest', '')
+
+STUDY_PLAN_KIND = SummaryKind(
+    "plan", BASE_PROMPT_STUDY_PLAN,
+    inputs=(("title", "PLAN"), ("sessions", "SESSIONS"), ("focus", "FOCUS")),
+    required=("title",), missing_error="No plan title", context=plan_digest
+)
+
+def job_label(job: dict) -> str:
+    values = job["input"]
+    if values.get("reference"):
+        ref = parse_reference(values["reference"])
+        return format_reference(ref) if ref else values["reference"]
+    return values.get("subtopic") or values.get("title") or ''
+
+def item_label(item: dict) -> str:
+    ref = parse_reference(item['reference']) if item.get('reference') else None
+    if ref:
+        return format_reference(ref)
+    book = find_book(item.get('book', ''))
+    return book['name'] if book else item.get('topic') or item.get('title') or ''
+
+def unit_digest(label: str, result: dict) -> str:
+    text = next((result[f] for f in DIGEST_TEXT_FIELDS if result.get(f)), '')
+    if len(text) > DIGEST_TEXT_CHARS:
+        text = text[:DIGEST_TEXT_CHARS].rsplit(' ', 1)[0] + '...'
+    points = next((result[f] for f in DIGEST_LIST_FIELDS if result.get(f)), [])[:DIGEST_LIST_ITEMS]
+    return f"- {label}: {text}" + (f" Themes: {'; '.join(points)}" if points else '')
+
+def plan_sessions(labels: list, count: int) -> list:
+    # Splits the units, in order, into `count` contiguous sessions of near-equal size.
+    size, extra = divmod(len(labels), count)
+    sessions, start = [], 0
+    for n in range(count):
+        end = start + size + (n < extra)
+        sessions.append(labels[start:end])
+        start = end
+    return sessions
+
+def build_study_plan(data: dict):
+    # Returns (title, focus, length, jobs, sessions) or raises BadSummaryRequest.
+    items = data.get('items') or [data]
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise BadSummaryRequest("items must be a list of objects")
+    if not any(item.get(k) for item in items for k in ('reference', 'book', 'topic', 'title')):
+        raise BadSummaryRequest("Provide a reference, book, topic or list of items")
+    length = summary_length(data.get('length'))
+    focus = text_field(data, 'focus').strip()
+    jobs = build_batch_jobs([dict(item, focus=item.get('focus', focus)) for item in items], [length])
+    if len(jobs) > STUDY_PLAN_MAX_UNITS:
+        raise BadSummaryRequest(f"Plan expands to {len(jobs)} units; the limit is {STUDY_PLAN_MAX_UNITS}")
+    try:
+        count = int(data.get('sessions') or min(len(jobs), STUDY_PLAN_MAX_SESSIONS))
+    except (TypeError, ValueError):
+        raise BadSummaryRequest("sessions must be a number")
+    count = max(1, min(count, len(jobs), STUDY_PLAN_MAX_SESSIONS))
+    title = text_field(data, 'title').strip() or '; '.join(filter(None, map(item_label, items)))
+    return title, focus, length, jobs, plan_sessions([job_label(job) for job in jobs], count)
+
+def synthesis_job(title: str, focus: str, length: str, sessions: list, labels: list, results: list):
+    digest = "\n".join(unit_digest(label, result) for label, result in zip(labels, results) if result is not None)
+    outline = " | ".join(f"Session {n}: {', '.join(units)}" for n, units in enumerate(sessions, 1))
+    return STUDY_PLAN_KIND.build({"title": title, "sessions": outline, "focus": focus, "length": length, "digest": digest})
+
+def study_plan_events(title, focus, length, jobs, sessions, cached, pending=(), retry_after=None):
+    # Yields (event, data) pairs ending with ('done', plan); raises if nothing could be
+    # generated. Units in `pending` are left out of this pass and listed in the plan.
+    labels = [job_label(job) for job in jobs]
+    futures = {
+        (cached_future(hit) if hit is not None else
+         summary_future(SUMMARY_KINDS[job["kind"]], job["key"], job["params"])): i
+        for i, (job, hit) in enumerate(zip(jobs, cached)) if i not in pending
+    }
+    yield 'plan', {"title": title, "total": len(futures), "cached": sum(hit is not None for hit in cached),
+                   "pending": len(pending), "sessions": sessions}
+    results = [None] * len(jobs)
+    errors = {}
+    for done, future in enumerate(concurrent.futures.as_completed(futures, UPSTREAM_TIMEOUT), 1):
+        i = futures[future]
+        event = {"done": done, "total": len(futures), "label": labels[i], "kind": jobs[i]["kind"], "cached": cached[i] is not None}
+        try:
+            results[i] = future.result()[0]
+            event["value"] = results[i]
+            METRICS.inc("study_plan_units_total", source='cache' if cached[i] is not None else 'generated')
+        except Exception as e:
+            errors[i] = e
+            event.update(error_payload(e))
+            METRICS.inc("study_plan_units_total", source='error')
+            METRICS.inc("summary_errors_total", kind=jobs[i]["kind"], type=error_type(e))
+        yield 'unit', event
+    if len(errors) == len(futures):
+        raise next(iter(errors.values()))
+    
+    key, params = synthesis_job(title, focus, length, sessions, labels, results)
+    synthesis = SUMMARY_CACHE.get(key)
+    if synthesis is None:
+        synthesis = summary_future(STUDY_PLAN_KIND, key, params).result(UPSTREAM_TIMEOUT)[0]
+    yield 'synthesis', synthesis
+    outlines = synthesis.get("sessions") or []
+    plan = dict(synthesis, title=title)
+    plan["sessions"] = [
+        {"session": n, "units": units, "outline": outlines[n - 1] if n <= len(outlines) else ''}
+        for n, units in enumerate(sessions, 1)
+    ]
+    plan["units"] = [
+        {"label": label, "kind": job["kind"], "cached": hit is not None, "pending": i in pending, "summary": result}
+        for i, (label, job, hit, result) in enumerate(zip(labels, jobs, cached, results))
+    ]
+    plan["failed"] = [labels[i] for i in sorted(errors)]
+    plan["pending"] = [labels[i] for i in sorted(pending)]
+    if pending:
+        plan["retryAfter"] = math.ceil(retry_after or 0)
+    yield 'done', plan
+
+@app.route('/api/study-plan', methods=['POST'])
+def study_plan():
+    if not get_client():
+        return jsonify({"error": "OpenAI client not configured"}), 500
+    
+    started = time.perf_counter()
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            raise BadSummaryRequest("Expected a JSON object")
+        title, focus, length, jobs, sessions = build_study_plan(data)
+    except BadSummaryRequest as e:
+        return jsonify({"error": str(e)}), 400
+    cached = [SUMMARY_CACHE.get(job["key"]) for job in jobs]
+    missing = [i for i, hit in enumerate(cached) if hit is None]
+    pending, wait = set(), None
+    if not missing:
+        # Every unit is cached, so the synthesis key is already known.
+        key, _ = synthesis_job(title, focus, length, sessions, [job_label(job) for job in jobs], cached)
+        cost = 0 if SUMMARY_CACHE.get(key) is not None else 1
+        if cost:
+            limited = rate_limit_response(cost)
+            if limited is not None:
+                return limited
+    else:
+        # One token pays for the synthesis and one for each unit generated. A plan
+        # bigger than the client's bucket generates what fits now; the rest is
+        # listed as pending and picked up by the same request once tokens refill.
+        cost = len(missing) + 1
+        some_cached = len(missing) < len(jobs)
+        minimum = 1 if some_cached else 2
+        granted = RATE_LIMITER.take_up_to(client_key(), cost, minimum)
+        if not granted:
+            return too_many_response(RATE_LIMITER.wait(client_key(), minimum), cost)
+        keep = granted - 1 if granted > 1 or some_cached else granted
+        pending = set(missing[keep:])
+        if pending:
+            wait = RATE_LIMITER.wait(client_key(), len(pending) + 1)
+    source = 'upstream' if cost else 'cache'
+    events = study_plan_events(title, focus, length, jobs, sessions, cached, pending, wait)
+    
+    if wants_stream():
+        def generate():
+            try:
+                for event, data in events:
+                    yield sse_event(event, data)
+                METRICS.observe("study_plan_duration_seconds", time.perf_counter() - started, length=length, source=source)
+            except Exception as e:
+                METRICS.inc("summary_errors_total", kind=STUDY_PLAN_KIND.name, type=error_type(e))
+                yield sse_event('error', error_payload(e))
+        return sse_response(generate())
+    
+    try:
+        plan = next(data for event, data in events if event == 'done')
     except json.JSONDecodeError as e:
+        METRICS.inc("summary_errors_total", kind=STUDY_PLAN_KIND.name, type=error_type(e))
         return jsonify({"error": f"Invalid JSON from AI: {str(e)}"}), 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        METRICS.inc("summary_errors_total", kind=STUDY_PLAN_KIND.name, type=error_type(e))
+        return error_response(e)
+    METRICS.observe("study_plan_duration_seconds", time.perf_counter() - started, length=length, source=source)
+    return jsonify(plan)
+
+def build_snapshot_command(args):
+    store = TalkStore.from_csv(args.csv)
+    store.write_snapshot(args.output, file_digest(args.csv))
+    print(f"Wrote {len(store)} talks to {args.output}")
+
+def build_semantic_command(args):
+    store = TalkStore.from_csv(args.csv)
+    index = SemanticIndex.fit(store, dims=args.dims, dtype=args.dtype, ivf_lists=args.ivf_lists)
+    index.save(args.model, args.embeddings, store_fingerprint(store, len(store)))
+    ivf = f", {len(index.ivf[0])} IVF lists" if index.ivf is not None else ""
+    print(f"Embedded {len(store)} talks in {index.components.shape[1]} dimensions ({args.dtype}{ivf}) to {args.embeddings}")
+
+def fetch_talk_text(url: str) -> str:
+    import urllib.request
+    req = urllib.request.Request(url, headers={"User-Agent": INGEST_USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        html = resp.read().decode(resp.headers.get_content_charset() or 'utf-8', errors='replace')
+    return extract_talk_text(html)
+
+def ingest_text_command(args):
+    from concurrent.futures import ThreadPoolExecutor
+    text_store = TalkTextStore(args.output, writable=True)
+    if args.jsonl:
+        # Offline import: one {"url": ..., "text": ...} object per line.
+        count = 0
+        with open(args.jsonl, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    text_store.put(item["url"], item["text"])
+                    count += 1
+        print(f"Imported {count} talks from {args.jsonl}")
+        return
+    store = TalkStore.from_csv(args.csv)
+    done = set() if args.refresh else text_store.urls()
+    urls = [u for u in dict.fromkeys(store.column("url")) if u and u not in done]
+    if args.limit:
+        urls = urls[:args.limit]
+    counts = {"stored": 0, "empty": 0, "error": 0}
+
+    def fetch(url):
+        try:
+            return url, fetch_talk_text(url), None
+        except Exception as e:
+            return url, None, e
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for finished, (url, text, error) in enumerate(pool.map(fetch, urls), 1):
+            if error is not None:
+                status = "error"
+            elif not text:
+                status = "empty"
+            else:
+                status = "stored"
+                text_store.put(url, text)
+            counts[status] += 1
+            print(f"[{finished}/{len(urls)}] {status:6} {url}" + (f": {error}" if error else ""))
+    print(f"Done: {counts['stored']} stored, {counts['empty']} without text, {counts['error']} failed, {len(done)} already stored")
+
+def ingest_talks_command(args):
+    global _TALK_DATA
+    if os.path.abspath(args.csv) != os.path.abspath(TALKS_CSV_PATH):
+        _TALK_DATA = TalkData(TalkStore.from_csv(args.csv))
+    with open(args.input, 'r', encoding='utf-8', newline='') as f:
+        if args.input.endswith('.json'):
+            talks = json.load(f)
+            talks = talks.get('talks', []) if isinstance(talks, dict) else talks
+        else:
+            talks = list(csv.DictReader(f))
+    try:
+        counts = ingest_talks(talks, args.csv)
+    except ValueError as e:
+        raise SystemExit(f"Nothing ingested: {e}")
+    print(f"Added {counts['added']} talks to {args.csv} ({counts['duplicates']} duplicates, "
+          f"{counts['invalid']} without title or url); {counts['total']} total")
+    if counts['added'] and os.path.exists(TALKS_SNAPSHOT_PATH):
+        print("The talks snapshot is now stale; run build-snapshot to refresh it")
+
+def load_batch_items(args) -> list:
+    items = []
+    if args.items:
+        with open(args.items, 'r', encoding='utf-8') as f:
+            items.extend(json.load(f))
+    items.extend({"kind": "scripture", "book": book} for book in args.book)
+    if args.doctrine:
+        items.append({"kind": "doctrine"})
+    if args.essentials:
+        items.append({"kind": "essentials"})
+    return items
+
+def batch_request_line(job: dict) -> dict:
+    # One line of an OpenAI Batch API input file; custom_id carries kind and cache key.
+    return {
+        "custom_id": f"{job['kind']}:{job['key']}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": job["params"]
+    }
+
+def prewarm_command(args):
+    jobs = build_batch_jobs(load_batch_items(args), args.lengths.split(','))
+    if args.export_batch:
+        pending = [job for job in jobs if SUMMARY_CACHE.get(job["key"]) is None]
+        with open(args.export_batch, 'w', encoding='utf-8') as f:
+            for job in pending:
+                f.write(json.dumps(batch_request_line(job)) + "\n")
+        print(f"Wrote {len(pending)} of {len(jobs)} requests to {args.export_batch}")
+        return
+    if not get_client():
+        sys.exit("OpenAI client not configured")
+    counts = {"cached": 0, "generated": 0, "error": 0}
+    for finished, (job, status, error) in enumerate(run_batch(jobs, args.concurrency), 1):
+        counts[status] += 1
+        label = job["input"].get("reference") or job["input"].get("subtopic") or job["input"].get("title")
+        print(f"[{finished}/{len(jobs)}] {status:9} {job['kind']} {label} ({job['input']['length']})" + (f": {error}" if error else ""))
+    print(f"Done: {counts['generated']} generated, {counts['cached']} already cached, {counts['error']} failed")
+
+def run_batch_file_command(args):
+    # Local stand-in for the OpenAI Batch API: executes an input file through the
+    # dispatcher and writes an output file in the same format the API returns.
+    with open(args.input, 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    futures = [
+        DISPATCHER.submit(line["custom_id"], lambda body=line["body"]: DISPATCHER.complete(queue_timeout=None, **body))
+        for line in lines
+    ]
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for line, future in zip(lines, futures):
+            try:
+                body = future.result(UPSTREAM_TIMEOUT).model_dump()
+                out = {"custom_id": line["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+            except Exception as e:
+                out = {"custom_id": line["custom_id"], "response": None, "error": {"message": str(e)}}
+            f.write(json.dumps(out) + "\n")
+    print(f"Wrote {len(lines)} results to {args.output}")
+
+def import_batch_command(args):
+    imported = failed = 0
+    with open(args.results, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            out = json.loads(line)
+            try:
+                text = out["response"]["body"]["choices"][0]["message"]["content"]
+                kind, key = out["custom_id"].split(':', 1)
+                SUMMARY_CACHE.set(key, parse_summary_text(SUMMARY_KINDS[kind], text))
+                imported += 1
+            except Exception as e:
+                print(f"Skipping {out.get('custom_id')}: {e}")
+                failed += 1
+    print(f"Imported {imported} summaries into the cache ({failed} skipped)")
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    import argparse
+    parser = argparse.ArgumentParser(description="Scripture & Conference Talk Study App")
+    commands = parser.add_subparsers(dest='command')
+    snapshot = commands.add_parser('build-snapshot', help="Prebuild the binary talks snapshot from the CSV")
+    snapshot.add_argument('--csv', default=TALKS_CSV_PATH)
+    snapshot.add_argument('--output', default=TALKS_SNAPSHOT_PATH)
+    snapshot.set_defaults(func=build_snapshot_command)
+    add_talks = commands.add_parser('ingest-talks', help="Append new talks (CSV or JSON list) to the talks CSV, skipping known urls")
+    add_talks.add_argument('input')
+    add_talks.add_argument('--csv', default=TALKS_CSV_PATH)
+    add_talks.set_defaults(func=ingest_talks_command)
+    semantic = commands.add_parser('build-semantic', help="Build the semantic search model and embedding matrix")
+    semantic.add_argument('--csv', default=TALKS_CSV_PATH)
+    semantic.add_argument('--model', default=SEMANTIC_MODEL_PATH)
+    semantic.add_argument('--embeddings', default=SEMANTIC_EMBEDDINGS_PATH)
+    semantic.add_argument('--dims', type=int, default=SEMANTIC_DIMS)
+    semantic.add_argument('--dtype', choices=('float32', 'int8'), default='float32')
+    semantic.add_argument('--ivf-lists', type=int, help=f"Approximate index size (default: sqrt(rows) from {SEMANTIC_IVF_MIN_ROWS} rows)")
+    semantic.set_defaults(func=build_semantic_command)
+    ingest = commands.add_parser('ingest-text', help="Fetch talk text for every CSV url into the compressed text store")
+    ingest.add_argument('--csv', default=TALKS_CSV_PATH)
+    ingest.add_argument('--output', default=TALK_TEXT_PATH)
+    ingest.add_argument('--jsonl', help="Import {url, text} lines from a file instead of fetching")
+    ingest.add_argument('--concurrency', type=int, default=INGEST_CONCURRENCY)
+    ingest.add_argument('--limit', type=int, help="Fetch at most this many talks")
+    ingest.add_argument('--refresh', action='store_true', help="Fetch again talks that are already stored")
+    ingest.set_defaults(func=ingest_text_command)
+    prewarm = commands.add_parser('prewarm', help="Generate and cache summaries for whole books or topic lists")
+    prewarm.add_argument('--items', help="JSON file with a list of batch items (same shape as /api/summarize/batch)")
+    prewarm.add_argument('--book', action='append', default=[], help="Every chapter of a book, e.g. --book Alma")
+    prewarm.add_argument('--doctrine', action='store_true', help="Every DEEP_DOCTRINE subtopic")
+    prewarm.add_argument('--essentials', action='store_true', help="Every GOSPEL_ESSENTIALS subtopic")
+    prewarm.add_argument('--lengths', default='standard', help="Comma-separated lengths, e.g. brief,standard,deep")
+    prewarm.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    prewarm.add_argument('--export-batch', help="Write uncached jobs as an OpenAI Batch API input file instead of running them")
+    prewarm.set_defaults(func=prewarm_command)
+    run_file = commands.add_parser('run-batch-file', help="Execute a Batch API input file locally")
+    run_file.add_argument('input')
+    run_file.add_argument('output')
+    run_file.set_defaults(func=run_batch_file_command)
+    import_batch = commands.add_parser('import-batch', help="Load a Batch API output file into the summary cache")
+    import_batch.add_argument('results')
+    import_batch.set_defaults(func=import_batch_command)
+    args = parser.parse_args()
+    if args.command:
+        args.func(args)
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5000)
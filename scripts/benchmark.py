@@ -0,0 +1,289 @@
+"""Benchmark every API route against synthetic talk corpora and a fake OpenAI backend.
+
+Each corpus scale runs in a fresh interpreter. Routes are driven twice: through
+Flask's test client (handler cost only) and through a threaded werkzeug server
+with concurrent keep-alive clients (adds WSGI, sockets and thread contention).
+Summaries go to scripts/fake_openai.py instead of OpenAI, so upstream latency is
+fixed and the numbers measure this app.
+
+    python scripts/benchmark.py --scales 1,10,100 --out bench.json
+    python scripts/benchmark.py --scales 10 --compare bench.json   # after a change
+
+Results are JSON: per scale and mode, each route has p50/p95/p99/mean latency in
+ms, throughput in requests/s, error count and RSS growth in KB. --compare prints
+the ratio against an earlier file and exits non-zero when a route's p50 or p95
+got slower by more than --threshold.
+"""
+import argparse
+import csv
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# (name, method, path, json body); "{i}" is replaced by the request number so
+# that upstream routes miss the summary cache on every call.
+ROUTES = [
+    ("index", "GET", "/", None),
+    ("canons", "GET", "/api/canons", None),
+    ("talks", "GET", "/api/talks", None),
+    ("talks_search", "GET", "/api/talks/search?q=faith", None),
+    ("talks_search_prefix", "GET", "/api/talks/search?q=fai+chr&limit=20", None),
+    ("talks_search_fuzzy", "GET", "/api/talks/search?q=atonment", None),
+    ("talks_years", "GET", "/api/talks/years", None),
+    ("talks_speakers", "GET", "/api/talks/speakers", None),
+    ("talks_sessions", "GET", "/api/talks/sessions", None),
+    ("talks_filter", "GET", "/api/talks/filter?year=2020&limit=50", None),
+    ("talks_filter_query", "GET", "/api/talks/filter?month=April&q=jesus+christ", None),
+    ("summarize_talk_cached", "POST", "/api/summarize/talk", {"title": "Cached talk", "speaker": "S"}),
+    ("summarize_talk_upstream", "POST", "/api/summarize/talk", {"title": "Talk {i}", "speaker": "S"}),
+    ("summarize_scripture_stream", "POST", "/api/summarize/scripture?stream=1", {"reference": "Alma 32", "focus": "Angle {i}"}),
+    ("health", "GET", "/api/health", None),
+    ("metrics", "GET", "/api/metrics", None),
+]
+UPSTREAM_ROUTES = {"summarize_talk_upstream", "summarize_scripture_stream"}
+
+def rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def summarize_latencies(latencies, wall, errors, rss_delta):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "rps": round(len(ordered) / wall, 1) if wall else 0.0,
+        "rss_delta_kb": rss_delta,
+    }
+
+def make_corpus(source, scale, path, seed=0):
+    # Writes `scale` copies of the real corpus. Copies get unique urls and a few
+    # words borrowed from other titles, so the vocabulary and postings grow too.
+    with open(source, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    words = sorted({w for r in rows for w in r['title'].split() if w.isalpha()})
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for copy in range(scale):
+            for row in rows:
+                if copy:
+                    row = dict(row)
+                    row['title'] = f"{row['title']} {rng.choice(words)} {rng.choice(words)}"
+                    row['url'] = f"{row['url']}&copy={copy}"
+                writer.writerow(row)
+    return len(rows) * scale
+
+def request_args(route, i):
+    name, method, path, body = route
+    path = path.replace('{i}', str(i))
+    if body is not None:
+        body = {k: v.replace('{i}', str(i)) for k, v in body.items()}
+    return method, path, body
+
+def run_client(app, route, requests, offset=0):
+    client = app.test_client()
+    latencies, errors = [], 0
+    before = rss_kb()
+    start = time.perf_counter()
+    for i in range(offset, offset + requests):
+        method, path, body = request_args(route, i)
+        t = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        latencies.append(time.perf_counter() - t)
+        errors += response.status_code >= 400
+    return summarize_latencies(latencies, time.perf_counter() - start, errors, rss_kb() - before)
+
+def run_wsgi(port, route, requests, concurrency, offset):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(offset, offset + requests))
+
+    def worker():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        local, failed = [], 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            method, path, body = request_args(route, i)
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json'} if payload else {}
+            t = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                failed += response.status >= 400
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            local.append(time.perf_counter() - t)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    before = rss_kb()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize_latencies(latencies, time.perf_counter() - start, errors[0], rss_kb() - before)
+
+def child(args):
+    # Runs inside a fresh interpreter with the corpus and fake backend in the env.
+    base = rss_kb()
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.abspath(args.app_dir))
+    import index
+    imported = time.perf_counter()
+    index.talk_data()
+    loaded = time.perf_counter()
+    report = {
+        "talks": len(index.talk_data().store),
+        "import_ms": round((imported - start) * 1000, 2),
+        "load_talks_ms": round((loaded - imported) * 1000, 2),
+        "rss_after_load_kb": rss_kb() - base,
+        "client": {}, "wsgi": {},
+    }
+    routes = [r for r in ROUTES if not args.routes or r[0] in args.routes]
+    for route in routes:
+        requests = args.upstream_requests if route[0] in UPSTREAM_ROUTES else args.requests
+        # The warm-up numbers its requests apart, so it cannot prime the cache for the
+        # upstream routes measured next; fixed-body routes like *_cached still warm up.
+        run_client(index.app, route, min(requests, 3), 2 * 10 ** 6)
+        report["client"][route[0]] = run_client(index.app, route, requests)
+
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, index.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for route in routes:
+        requests = args.upstream_requests if route[0] in UPSTREAM_ROUTES else args.requests
+        # Offset the request numbers so upstream routes do not hit entries cached above.
+        report["wsgi"][route[0]] = run_wsgi(server.server_port, route, requests, args.concurrency, 10 ** 6)
+    server.shutdown()
+    report["rss_final_kb"] = rss_kb() - base
+    print(json.dumps(report))
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"{'scale':>6} {'mode':<7} {'route':<28} {'p50':>8} {'p95':>8}")
+    for scale, result in current["scales"].items():
+        old = baseline.get("scales", {}).get(scale)
+        if not old:
+            continue
+        for mode in ("client", "wsgi"):
+            for route, stats in result[mode].items():
+                before = old.get(mode, {}).get(route)
+                if not before:
+                    continue
+                ratios = [stats[k] / before[k] if before[k] else 1.0 for k in ("p50_ms", "p95_ms")]
+                flag = " REGRESSION" if max(ratios) > 1 + threshold else ""
+                print(f"{scale:>6} {mode:<7} {route:<28} {ratios[0]:>7.2f}x {ratios[1]:>7.2f}x{flag}")
+                if flag:
+                    regressions.append((scale, mode, route))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app-dir', default=os.path.join(ROOT, 'api'))
+    parser.add_argument('--scales', default='1,10', help='comma-separated corpus multipliers of data/talks.csv')
+    parser.add_argument('--routes', default='', help='comma-separated route names (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--upstream-requests', type=int, default=40, help='requests per summarize route')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads against the WSGI server')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake OpenAI time to first byte (s)')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='fake OpenAI delay per stream chunk (s)')
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before flagging')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.routes = [r for r in args.routes.split(',') if r]
+    if args.child:
+        return child(args)
+
+    from fake_openai import start_server
+    fake = start_server(latency=args.latency, token_delay=args.token_delay)
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "config": {k: getattr(args, k) for k in (
+                "requests", "upstream_requests", "concurrency", "latency", "token_delay")},
+        },
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as work:
+        for scale in (int(s) for s in args.scales.split(',')):
+            corpus = os.path.join(work, f"talks_x{scale}.csv")
+            make_corpus(os.path.join(ROOT, 'data', 'talks.csv'), scale, corpus)
+            env = dict(os.environ,
+                       TALKS_CSV_PATH=corpus,
+                       TALKS_SNAPSHOT_PATH=os.path.join(work, 'missing.snapshot'),
+                       SUMMARY_CACHE_PATH=os.path.join(work, f"cache_x{scale}.sqlite3"),
+                       OPENAI_BASE_URL=fake.base_url,
+                       OPENAI_API_KEY='benchmark',
+                       RATE_LIMIT_PER_MINUTE='0',
+                       WARMUP='0')
+            cmd = [sys.executable, os.path.abspath(__file__), '--child', '--app-dir', args.app_dir,
+                   '--routes', ','.join(args.routes), '--requests', str(args.requests),
+                   '--upstream-requests', str(args.upstream_requests),
+                   '--concurrency', str(args.concurrency)]
+            print(f"scale x{scale}...", file=sys.stderr)
+            out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+            results["scales"][str(scale)] = json.loads(out.strip().splitlines()[-1])
+    results["meta"]["upstream_calls"] = fake.requests
+    fake.shutdown()
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Local stand-in for the OpenAI chat completions API, for benchmarks and load tests.
+
+Answers POST /v1/chat/completions with a canned JSON summary after a configurable
+delay, either as one response or as a token stream (with a final usage chunk when
+stream_options.include_usage is set). With --capacity, requests beyond that many in
+flight get a 429 with Retry-After, like a rate-limited account. Point the app at it
+with OPENAI_BASE_URL.
+
+    python scripts/fake_openai.py --port 8765 --latency 0.5 --token-delay 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=x python api/index.py
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from index import STUDY_PLAN_KIND, SUMMARY_KINDS, SYSTEM_PROMPT
+
+def kind_payload(kind) -> dict:
+    # A full answer in the kind's own schema, at roughly the size of a real
+    # "standard" one, so validation keeps all of it and the app does the real work.
+    payload = {}
+    for n, (field, expected) in enumerate(kind.schema.items()):
+        if n == 0:
+            payload[field] = "Alma 32"
+        elif expected is list:
+            payload[field] = [f"Point {i} about {field} for benchmarking, long enough to matter." for i in range(1, 5)]
+        else:
+            payload[field] = f"A steady {field} sentence for benchmarking the app. " * 6
+    return payload
+
+# Keyed by the system message each kind sends, which carries its schema.
+PAYLOADS = {
+    SYSTEM_PROMPT + "\n\n" + kind.base_prompt: kind_payload(kind)
+    for kind in list(SUMMARY_KINDS.values()) + [STUDY_PLAN_KIND]
+}
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.2
+    token_delay = 0.0
+    chunk_chars = 16
+    capacity = 0
+    prompt_tokens = 900
+    cached_tokens = 768
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.server.lock:
+            self.server.requests += 1
+            if self.capacity and self.server.active >= self.capacity:
+                self.server.rejected += 1
+                rejected = True
+            else:
+                self.server.active += 1
+                rejected = False
+        if rejected:
+            out = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode()
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+            return
+        try:
+            self._respond(body)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _respond(self, body: dict):
+        time.sleep(self.latency)
+        system = next((m.get("content") for m in body.get("messages", []) if m.get("role") == "system"), None)
+        content = json.dumps(PAYLOADS.get(system, kind_payload(SUMMARY_KINDS["scripture"])))
+        usage = {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": self.prompt_tokens + len(content) // 4,
+            "prompt_tokens_details": {"cached_tokens": self.cached_tokens},
+        }
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model", "fake")}
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(content), self.chunk_chars):
+                delta = {"index": 0, "delta": {"content": content[i:i + self.chunk_chars]}, "finish_reason": None}
+                self._chunk(dict(base, object="chat.completion.chunk", choices=[delta]))
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+            self._chunk(dict(base, object="chat.completion.chunk",
+                             choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._chunk(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+            self._write(b"data: [DONE]\n\n")
+            self._write(b"")
+            return
+        out = json.dumps(dict(base, object="chat.completion", usage=usage, choices=[{
+            "index": 0, "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }])).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _chunk(self, data):
+        self._write(b"data: " + json.dumps(data).encode() + b"\n\n")
+
+    def _write(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+def start_server(port=0, latency=0.2, token_delay=0.0, chunk_chars=16, capacity=0):
+    # Returns a running server in a daemon thread; its base URL is server.base_url.
+    handler = type('Handler', (FakeOpenAIHandler,), {
+        "latency": latency, "token_delay": token_delay, "chunk_chars": chunk_chars, "capacity": capacity,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.active = 0
+    server.rejected = 0
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before the first byte')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between stream chunks')
+    parser.add_argument('--chunk-chars', type=int, default=16)
+    parser.add_argument('--capacity', type=int, default=0, help='concurrent requests before answering 429 (0 = unlimited)')
+    args = parser.parse_args()
+    server = start_server(args.port, args.latency, args.token_delay, args.chunk_chars, args.capacity)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Measure cold-start cost of the Flask app: import time, time to the first
+talks response, time to build the OpenAI client, and resident memory at each point.
+
+Every run happens in a fresh interpreter so nothing is shared between samples.
+Python-level allocations still held after the first request are measured in a
+separate pass with tracemalloc, because tracing slows the timed runs down, and a
+third pass under `python -X importtime` lists the heaviest imports of api/index.py
+(cumulative ms, median over runs).
+
+    python scripts/measure_startup.py --runs 7
+    python scripts/measure_startup.py --app-dir /tmp/old/api   # compare a checkout
+    python scripts/measure_startup.py --ref HEAD~1              # compare a commit
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = r"""
+import json, os, resource, sys, time, tracemalloc
+
+def rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+trace = sys.argv[3] == '1'
+if trace:
+    tracemalloc.start()
+start = time.perf_counter()
+base_rss = rss_kb()
+sys.path.insert(0, sys.argv[1])
+import index
+imported = time.perf_counter()
+import_rss = rss_kb()
+client = index.app.test_client()
+client.get(sys.argv[2])
+first = time.perf_counter()
+if trace:
+    print(json.dumps({"traced_kb": tracemalloc.get_traced_memory()[0] // 1024}))
+    sys.exit(0)
+# Older trees build the client at import; then this costs nothing here.
+getattr(index, 'get_client', lambda: None)()
+built = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_talks_request_ms": (first - imported) * 1000,
+    "openai_client_ms": (built - first) * 1000,
+    "import_rss_kb": import_rss - base_rss,
+    "after_first_request_rss_kb": rss_kb() - base_rss,
+}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+def sample(app_dir, path, env, trace=False):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD, app_dir, path, '1' if trace else '0'],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def import_profile(app_dir, env):
+    # Cumulative microseconds per module imported directly by index, plus index itself.
+    err = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {app_dir!r}); import index"],
+        env=env, capture_output=True, text=True, check=True
+    ).stderr
+    lines = [m.groups() for m in map(IMPORTTIME_LINE.match, err.splitlines()) if m]
+    # Output is post-order: a module's line follows all of its children's lines.
+    total = next(i for i, line in enumerate(lines) if line[3] == 'index' and not line[2])
+    start = max((i for i, line in enumerate(lines[:total]) if not line[2]), default=-1) + 1
+    modules = {name: int(cumulative_us) for _, cumulative_us, indent, name in lines[start:total] if len(indent) == 2}
+    modules['index (self)'] = int(lines[total][0])
+    modules['index (total)'] = int(lines[total][1])
+    return modules
+
+def export_ref(ref, work):
+    # Writes api/index.py as of `ref` next to the current templates and data.
+    os.makedirs(os.path.join(work, 'api'))
+    source = subprocess.run(['git', 'show', f'{ref}:api/index.py'], cwd=ROOT,
+                            capture_output=True, check=True).stdout
+    with open(os.path.join(work, 'api', 'index.py'), 'wb') as f:
+        f.write(source)
+    for name in ('templates', 'data', 'static'):
+        if os.path.exists(os.path.join(ROOT, name)):
+            os.symlink(os.path.abspath(os.path.join(ROOT, name)), os.path.join(work, name))
+    return os.path.join(work, 'api')
+
+def measure(app_dir, path, runs, top, env):
+    # Deployed code runs from bytecode; compile first so no tree is charged for it.
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', app_dir], check=True)
+    samples = [sample(app_dir, path, env) for _ in range(runs)]
+    report = {key: round(statistics.median(s[key] for s in samples), 2) for key in samples[0]}
+    report.update(sample(app_dir, path, env, trace=True))
+    profiles = [import_profile(app_dir, env) for _ in range(runs)]
+    names = set().union(*profiles)
+    imports = {name: round(statistics.median(p.get(name, 0) for p in profiles) / 1000, 2) for name in names}
+    report["imports_ms"] = dict(sorted(imports.items(), key=lambda kv: -kv[1])[:top + 2])
+    report["runs"] = runs
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app-dir', default=os.path.join(ROOT, 'api'))
+    parser.add_argument('--path', default='/api/talks/search?q=faith')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports to list')
+    parser.add_argument('--ref', help='also measure api/index.py from this git revision')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_KEY', 'measure-startup')
+    env['WARMUP'] = '0'
+    report = measure(os.path.abspath(args.app_dir), args.path, args.runs, args.top, env)
+    if args.ref:
+        with tempfile.TemporaryDirectory() as work:
+            report = {"current": report, args.ref: measure(export_ref(args.ref, work), args.path, args.runs, args.top, env)}
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import types
+
+import pytest
+
+# api/index.py is a single-file Vercel function, not an installed package.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+os.environ.setdefault("WARMUP", "0")
+os.environ.setdefault("SUMMARY_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "summary_cache.sqlite3"))
+
+
+class FakeCompletions:
+    # Holds every call open until `gate` is set, so concurrent callers overlap.
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = 0
+        self.gate = threading.Event()
+
+    async def create(self, stream=False, **kwargs):
+        self.calls += 1
+        while not self.gate.is_set():
+            await asyncio.sleep(0.005)
+        text = json.dumps(self.payload)
+        if stream:
+            async def chunks():
+                for i in range(0, len(text), 5):
+                    delta = types.SimpleNamespace(content=text[i:i + 5])
+                    yield types.SimpleNamespace(usage=None, choices=[types.SimpleNamespace(finish_reason=None, delta=delta)])
+            return chunks()
+        message = types.SimpleNamespace(content=text)
+        usage = types.SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_tokens_details=None)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason='stop')], usage=usage)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    import index
+    fake = FakeCompletions({"reference": "Alma 32", "overview": "Faith as a seed.", "themes": ["faith"]})
+    monkeypatch.setattr(index, "_CLIENT", types.SimpleNamespace(chat=types.SimpleNamespace(completions=fake)))
+    return fake
@@ -0,0 +1,34 @@
+import pytest
+
+import index
+from index import BadSummaryRequest, build_batch_jobs
+
+
+def test_batch_expands_books_ranges_and_lengths():
+    jobs = build_batch_jobs([{"book": "Enos"}, {"reference": "Alma 5-6"}, {"reference": "alma 5"}], ["brief", "deep"])
+    labels = [(job["input"]["reference"], job["input"]["length"]) for job in jobs]
+    # "alma 5" is the same unit as the first chapter of "Alma 5-6", so it is not repeated.
+    assert labels == [
+        ("Enos 1", "brief"), ("Enos 1", "deep"),
+        ("Alma 5", "brief"), ("Alma 5", "deep"),
+        ("Alma 6", "brief"), ("Alma 6", "deep"),
+    ]
+
+
+def test_batch_expands_topics_into_subtopics():
+    topic = index.DEEP_DOCTRINE[0]
+    jobs = build_batch_jobs([{"kind": "doctrine", "topic": topic["topic"]}], ["standard"])
+    assert [job["input"]["subtopic"] for job in jobs] == topic["subtopics"]
+
+
+@pytest.mark.parametrize("items, lengths", [
+    (["Alma"], ["standard"]),
+    ([{"reference": 5}], ["standard"]),
+    ([{"book": "Nowhere"}], ["standard"]),
+    ([{"kind": "poetry", "title": "x"}], ["standard"]),
+    ([{"reference": "Alma 5"}], "deep"),
+    ([{"reference": "Alma 5"}], ["epic"]),
+])
+def test_batch_rejects_bad_items(items, lengths):
+    with pytest.raises(BadSummaryRequest):
+        build_batch_jobs(items, lengths)
@@ -0,0 +1,59 @@
+import pytest
+
+import index
+from index import SUMMARY_KINDS, SummaryCache
+
+
+def scripture_key(**data):
+    return SUMMARY_KINDS["scripture"].build(dict({"reference": "Alma 32"}, **data))[0]
+
+
+def test_length_aliases_share_a_key():
+    deep = scripture_key(length="deep")
+    assert scripture_key(length="DEEP") == deep
+    assert scripture_key(length=" Deep ") == deep
+    assert scripture_key(length="standard") != deep
+
+
+def test_unknown_lengths_fall_back_to_standard():
+    standard = scripture_key(length="standard")
+    assert scripture_key() == standard
+    assert scripture_key(length="epic") == standard
+    assert scripture_key(length=["deep"]) == standard
+
+
+def test_reference_spellings_share_a_key():
+    assert scripture_key(reference="alma 32") == scripture_key(reference="Alma ch. 32")
+
+
+@pytest.mark.parametrize("name, value", [
+    ("SYSTEM_PROMPT", "Return JSON."),
+    ("MODEL", "another-model"),
+    ("MAX_TOKENS", {"brief": 1, "standard": 2, "deep": 3}),
+])
+def test_request_settings_are_part_of_the_key(monkeypatch, name, value):
+    before = scripture_key()
+    monkeypatch.setattr(index, name, value)
+    assert scripture_key() != before
+
+
+def test_length_guidance_is_part_of_the_key(monkeypatch):
+    before = scripture_key()
+    monkeypatch.setattr(index, "length_guidance", lambda length: "As long as you like.")
+    assert scripture_key() != before
+
+
+def test_disk_tier_outlives_the_memory_tier(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.sqlite3"), ttl=60, memory_entries=1, disk_entries=10)
+    cache.set("a", {"summary": "first"})
+    cache.set("b", {"summary": "second"})
+    assert list(cache.memory) == ["b"]
+    assert cache.get("a") == {"summary": "first"}
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.sqlite3"), ttl=0, memory_entries=4, disk_entries=10)
+    cache.set("a", {"summary": "stale"})
+    assert cache.get("a") is None
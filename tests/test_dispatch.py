@@ -0,0 +1,80 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import index
+from index import RateLimiter, UpstreamDispatcher
+
+
+def test_identical_submissions_share_one_call():
+    dispatcher = UpstreamDispatcher(4)
+    gate = threading.Event()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        while not gate.is_set():
+            await asyncio.sleep(0.005)
+        return value
+
+    first = dispatcher.submit("a", lambda: work(1))
+    second = dispatcher.submit("a", lambda: work(2))
+    other = dispatcher.submit("b", lambda: work(3))
+    assert first is second and other is not first
+    assert dispatcher.pending("a") is first
+    gate.set()
+    assert (first.result(5), other.result(5)) == (1, 3)
+    assert sorted(calls) == [1, 3] and dispatcher.coalesced == 1
+    # Once settled the key is forgotten, so the next call goes upstream again.
+    assert dispatcher.pending("a") is None
+    assert dispatcher.submit("a", lambda: work(4)).result(5) == 4
+
+
+def test_a_shared_failure_reaches_every_caller_and_is_forgotten():
+    dispatcher = UpstreamDispatcher(4)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    futures = [dispatcher.submit("a", fail) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(5)
+    assert dispatcher.pending("a") is None
+
+
+def test_identical_streams_share_one_upstream_stream(upstream):
+    dispatcher = UpstreamDispatcher(4)
+    leader_chunks, leader = dispatcher.stream("k", model="m", messages=[])
+    follower_chunks, follower = dispatcher.stream("k", model="m", messages=[])
+    assert (leader, follower) == (True, False)
+    upstream.gate.set()
+    texts = ["".join(c.choices[0].delta.content for c in chunks) for chunks in (leader_chunks, follower_chunks)]
+    assert texts[0] == texts[1] == json.dumps(upstream.payload)
+    assert upstream.calls == 1
+
+
+def test_concurrent_summary_requests_make_one_upstream_call(upstream, monkeypatch):
+    monkeypatch.setattr(index, "RATE_LIMITER", RateLimiter(0, 1))
+    statuses = []
+
+    def post():
+        response = index.app.test_client().post('/api/summarize/scripture', json={"reference": "Alma 30", "focus": "coalescing test"})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=post) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for _ in range(200):
+        if index.DISPATCHER.stats()["inflight"]:
+            break
+        threading.Event().wait(0.005)
+    threading.Event().wait(0.05)
+    upstream.gate.set()
+    for thread in threads:
+        thread.join(10)
+    assert statuses == [200] * 8
+    assert upstream.calls == 1
@@ -0,0 +1,16 @@
+import index
+
+
+def test_health_does_not_load_the_talks(monkeypatch):
+    monkeypatch.setattr(index, "_TALK_DATA", None)
+    monkeypatch.setattr(index, "WARMUP", False)
+    response = index.app.test_client().get('/api/health')
+    assert response.status_code == 200
+    assert response.json["talks_loaded"] == 0
+    assert response.json["semantic_loaded"] is False
+    assert index._TALK_DATA is None
+
+
+def test_health_reports_loaded_talks():
+    count = len(index.talk_data().store)
+    assert index.app.test_client().get('/api/health').json["talks_loaded"] == count
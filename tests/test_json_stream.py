@@ -0,0 +1,68 @@
+import json
+import random
+
+import pytest
+
+from index import JSONFieldStream, coerce_field
+
+SCHEMA = {"title": str, "summary": str, "themes": list, "questions": list}
+DOCUMENT = json.dumps({
+    "title": "Alma 32 \"faith\" {not a brace} [nor a bracket]",
+    "summary": "Line one\nline two \\ with a backslash and café",
+    "themes": ["faith, hope", "a \"seed\"", None, {"nested": [1, 2]}, 7],
+    "extra": {"ignored": ["x"]},
+    "questions": "a bare string where a list belongs",
+}, indent=2, ensure_ascii=False)
+
+
+def run(chunks, schema=SCHEMA):
+    stream = JSONFieldStream(schema)
+    events = []
+    for chunk in chunks:
+        events.extend(stream.feed(chunk))
+    return events
+
+
+def split_at(text, cuts):
+    bounds = [0] + sorted(cuts) + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+WHOLE = run([DOCUMENT])
+
+
+def test_fields_match_the_validated_object():
+    fields = {data["key"]: data["value"] for event, data in WHOLE if event == "field"}
+    parsed = json.loads(DOCUMENT)
+    assert fields == {key: coerce_field(expected, parsed[key]) for key, expected in SCHEMA.items()}
+
+
+def test_items_are_reported_in_order_without_nulls():
+    items = [(data["key"], data["index"], data["value"]) for event, data in WHOLE if event == "item"]
+    assert items == [
+        ("themes", 0, "faith, hope"),
+        ("themes", 1, 'a "seed"'),
+        ("themes", 2, '{"nested": [1, 2]}'),
+        ("themes", 3, "7"),
+    ]
+
+
+def test_every_two_way_split():
+    for cut in range(1, len(DOCUMENT)):
+        assert run(split_at(DOCUMENT, [cut])) == WHOLE, cut
+
+
+def test_one_character_at_a_time():
+    assert run(DOCUMENT) == WHOLE
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunking(seed):
+    rng = random.Random(seed)
+    cuts = rng.sample(range(1, len(DOCUMENT)), rng.randint(2, 40))
+    assert run(split_at(DOCUMENT, cuts)) == WHOLE
+
+
+def test_without_a_schema_every_field_is_reported():
+    keys = [data["key"] for event, data in run([DOCUMENT], schema=None) if event == "field"]
+    assert keys == ["title", "summary", "themes", "extra", "questions"]
@@ -0,0 +1,133 @@
+import asyncio
+import math
+
+import pytest
+
+import index
+from index import AdaptiveLimit, RateLimiter, UpstreamOverloaded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tokens_refill_at_the_configured_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=60, burst=2, clock=clock)
+    assert limiter.take("a") == 0
+    assert limiter.take("a") == 0
+    assert limiter.take("a") == pytest.approx(1.0)
+    clock.now += 0.5
+    assert limiter.take("a") == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.take("a") == 0
+    # Buckets are per client.
+    assert limiter.take("b", 2) == 0
+
+
+def test_cost_above_the_burst_is_never_admitted():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=60, burst=2, clock=clock)
+    assert limiter.take("a", 3) == math.inf
+    # A rejected request is not charged.
+    assert limiter.take("a", 2) == 0
+
+
+def test_zero_rate_disables_the_limiter():
+    assert RateLimiter(per_minute=0, burst=1).take("a", 100) == 0
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(index, "UPSTREAM_QUEUE_MAX", 2)
+
+    async def scenario():
+        limit = AdaptiveLimit(1, 1)
+        await limit.acquire(1)
+        queued = [asyncio.ensure_future(limit.acquire(1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloaded):
+            await limit.acquire(1)
+        # Background work waits in its own queue instead of being turned away.
+        background = asyncio.ensure_future(limit.acquire(None))
+        await asyncio.sleep(0)
+        assert not background.done()
+        for _ in range(3):
+            limit.release()
+        await asyncio.gather(*queued, background)
+
+    asyncio.run(scenario())
+
+
+def test_waiters_past_their_deadline_are_rejected():
+    async def scenario():
+        limit = AdaptiveLimit(1, 1)
+        await limit.acquire(1)
+        with pytest.raises(UpstreamOverloaded):
+            await limit.acquire(0.01)
+        assert not limit.waiters
+        limit.release()
+        assert limit.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_slots_are_handed_over_in_arrival_order():
+    async def scenario():
+        limit = AdaptiveLimit(1, 1)
+        await limit.acquire(1)
+        order = []
+
+        async def wait(name, timeout):
+            await limit.acquire(timeout)
+            order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(wait("batch", None)),
+            asyncio.ensure_future(wait("first", 1)),
+            asyncio.ensure_future(wait("second", 1)),
+        ]
+        await asyncio.sleep(0)
+        for _ in tasks:
+            limit.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["first", "second", "batch"]
+
+    asyncio.run(scenario())
+
+
+def test_limit_halves_once_per_window():
+    clock = FakeClock()
+    limit = AdaptiveLimit(16, 2, clock=clock)
+    limit.inflight = 4
+    limit.release(overloaded=True)
+    limit.release(overloaded=True)
+    assert limit.limit == 8
+    clock.now += 2
+    limit.release(overloaded=True)
+    assert limit.limit == 4
+    clock.now += 2
+    limit.release(overloaded=True)
+    clock.now += 2
+    limit.inflight = 1
+    limit.release(overloaded=True)
+    assert limit.limit == 2
+
+
+def test_take_up_to_grants_what_the_bucket_holds():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=60, burst=10, clock=clock)
+    assert limiter.take_up_to("a", 15) == 10
+    assert limiter.wait("a", 6) == pytest.approx(6.0)
+    clock.now += 1.5
+    # One whole token is available, but the caller needs at least two.
+    assert limiter.take_up_to("a", 5, minimum=2) == 0
+    assert limiter.wait("a", 2) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.take_up_to("a", 5, minimum=2) == 2
+    # Waits never ask for more than a full bucket.
+    assert limiter.wait("a", 50) == pytest.approx(10.0)
@@ -0,0 +1,36 @@
+import pytest
+
+import index
+
+ROUTES = ["/api/talks?format=json", "/api/talks/search?q=faith", "/api/talks/semantic?q=faith", "/api/talks/filter?year=2020"]
+
+
+def get(url):
+    return index.app.test_client().get(url)
+
+
+@pytest.mark.parametrize("route", ROUTES)
+@pytest.mark.parametrize("arg", ["limit=abc", "limit=0", "limit=-5", "offset=-1", "offset=1.5", "cursor=x", "cursor=-2"])
+def test_invalid_values_are_rejected_everywhere(route, arg):
+    response = get(f"{route}&{arg}")
+    assert response.status_code == 400
+    assert response.json["error"].startswith("Invalid ")
+
+
+def test_limits_above_the_maximum_are_capped():
+    response = get(f"/api/talks/search?q=the&limit={index.SEARCH_MAX_LIMIT + 100}")
+    assert response.status_code == 200
+    assert len(response.json) <= index.SEARCH_MAX_LIMIT
+
+
+@pytest.mark.parametrize("route", ["/api/talks?limit=7", "/api/talks/filter?limit=7"])
+def test_cursor_pages_cover_every_row_once(route):
+    seen, cursor = [], None
+    while True:
+        response = get(route + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        seen.extend(talk["url"] for talk in response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == int(response.headers["X-Total-Count"])
@@ -0,0 +1,55 @@
+import pytest
+
+from index import BadSummaryRequest, format_reference, parse_reference, scripture_units
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 Ne 3", "1 Nephi 3"),
+    ("1st Nephi 3", "1 Nephi 3"),
+    ("First Nephi 3", "1 Nephi 3"),
+    ("I Nephi 3", "1 Nephi 3"),
+    ("D&C 76", "Doctrine and Covenants 76"),
+    ("Ps 23", "Psalms 23"),
+    ("JS-H 1:17", "Joseph Smith-History 1:17"),
+    ("Hel 5", "Helaman 5"),
+])
+def test_abbreviations_and_ordinals(text, expected):
+    assert format_reference(parse_reference(text)) == expected
+
+
+def test_verses_and_ranges():
+    assert parse_reference("Mosiah 2:17-18")["verses"] == "17-18"
+    assert parse_reference("Alma 32.21")["verses"] == "21"
+    ref = parse_reference("Alma 5-7")
+    assert (ref["start"], ref["end"], ref["verses"]) == (5, 7, "")
+    assert format_reference(parse_reference("alma 5 to 7")) == "Alma 5-7"
+
+
+def test_one_chapter_books():
+    # A bare number in a one-chapter book is a verse, and the book alone is chapter 1.
+    assert format_reference(parse_reference("Jude 3")) == "Jude 1:3"
+    assert format_reference(parse_reference("Omni 2")) == "Omni 1:2"
+    assert format_reference(parse_reference("Enos")) == "Enos 1"
+
+
+@pytest.mark.parametrize("text", ["Alma 64", "1 Nephi 0", "Alma 7-5"])
+def test_impossible_chapters_are_rejected(text):
+    with pytest.raises(BadSummaryRequest):
+        parse_reference(text)
+
+
+@pytest.mark.parametrize("text", ["love one another", "faith in Jesus Christ", "", None, 5])
+def test_themes_pass_through(text):
+    assert parse_reference(text) is None
+
+
+def test_short_ranges_split_into_chapters():
+    label, units = scripture_units({"reference": "mosiah 2-5", "focus": "service"})
+    assert label == "Mosiah 2-5"
+    assert units == [{"reference": f"Mosiah {n}", "focus": "service"} for n in range(2, 6)]
+
+
+def test_long_ranges_stay_one_summary():
+    assert format_reference(parse_reference("3 Ne 11-30")) == "3 Nephi 11-30"
+    assert scripture_units({"reference": "3 Ne 11-30"}) is None
+    assert scripture_units({"reference": "Alma 32:21-43"}) is None
@@ -0,0 +1,56 @@
+import pytest
+
+import index
+from index import TALK_COLUMNS, TalkStore, file_digest
+
+TALKS = [
+    {"title": "Faith in Christ", "speaker": "Elder Ana Giménez", "month": "04", "year": "2020",
+     "session": "Saturday Morning", "url": "https://example.org/1", "tags": "faith;hope", "excerpt": "Line one\nline two"},
+    {"title": "Hope", "speaker": "Elder Ana Giménez", "month": "10", "year": "2020",
+     "session": "", "url": "https://example.org/2", "tags": "", "excerpt": ""},
+    {"title": "Charity “never faileth”", "speaker": "Sister Lee", "month": "04", "year": "2021",
+     "session": "Saturday Morning", "url": "https://example.org/3"},
+]
+
+
+def rows(store):
+    return store.rows(range(len(store)))
+
+
+def test_round_trip(tmp_path):
+    store = TalkStore()
+    for talk in TALKS:
+        store.append(talk)
+    path = str(tmp_path / "talks.snapshot")
+    store.write_snapshot(path, "digest")
+    loaded = TalkStore.from_snapshot(path, "digest")
+    assert len(loaded) == len(store)
+    assert rows(loaded) == rows(store)
+    assert loaded.column("speaker") == [t["speaker"] for t in TALKS]
+    # Dictionary columns stay dictionary-encoded and can keep growing.
+    loaded.append({"title": "New", "speaker": "Sister Lee"})
+    assert loaded.columns["speaker"].values == ["Elder Ana Giménez", "Sister Lee"]
+
+
+def test_empty_store_round_trip(tmp_path):
+    path = str(tmp_path / "talks.snapshot")
+    TalkStore().write_snapshot(path, "digest")
+    loaded = TalkStore.from_snapshot(path)
+    assert len(loaded) == 0
+    assert all(loaded.column(name) == [] for name in TALK_COLUMNS)
+
+
+def test_stale_or_foreign_files_are_rejected(tmp_path):
+    path = str(tmp_path / "talks.snapshot")
+    TalkStore().write_snapshot(path, "digest")
+    with pytest.raises(ValueError):
+        TalkStore.from_snapshot(path, "another digest")
+    other = tmp_path / "other"
+    other.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        TalkStore.from_snapshot(str(other))
+
+
+def test_committed_snapshot_matches_the_csv():
+    snapshot = TalkStore.from_snapshot(index.TALKS_SNAPSHOT_PATH, file_digest(index.TALKS_CSV_PATH))
+    assert rows(snapshot) == rows(TalkStore.from_csv(index.TALKS_CSV_PATH))
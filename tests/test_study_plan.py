@@ -0,0 +1,64 @@
+import pytest
+
+import index
+from index import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=60, burst=10, clock=clock)
+    monkeypatch.setattr(index, "RATE_LIMITER", limiter)
+    return clock
+
+
+def post(body):
+    return index.app.test_client().post('/api/study-plan', json=body)
+
+
+def test_plan_within_the_burst_generates_every_unit(upstream, limiter):
+    upstream.gate.set()
+    response = post({"reference": "Mosiah 2-5", "focus": "within the burst"})
+    assert response.status_code == 200
+    plan = response.json
+    assert [unit["label"] for unit in plan["units"]] == [f"Mosiah {n}" for n in range(2, 6)]
+    assert plan["pending"] == [] and plan["failed"] == []
+    assert "retryAfter" not in plan
+    assert upstream.calls == 5
+
+
+def test_plan_beyond_the_burst_returns_the_rest_as_pending(upstream, limiter):
+    upstream.gate.set()
+    body = {"items": [{"reference": "Mosiah 1-10"}, {"reference": "Mosiah 11-14"}], "focus": "beyond the burst"}
+    first = post(body)
+    assert first.status_code == 200
+    plan = first.json
+    # Ten tokens: nine units and the synthesis.
+    assert [unit["label"] for unit in plan["units"] if unit["summary"]] == [f"Mosiah {n}" for n in range(1, 10)]
+    assert plan["pending"] == [f"Mosiah {n}" for n in range(10, 15)]
+    assert all(unit["pending"] for unit in plan["units"][9:])
+    assert plan["retryAfter"] == 6
+    assert upstream.calls == 10
+
+    assert post(body).status_code == 429
+    limiter.now += plan["retryAfter"]
+    second = post(body).json
+    assert second["pending"] == []
+    assert all(unit["summary"] for unit in second["units"])
+    assert upstream.calls == 16
+
+
+def test_plan_with_no_tokens_is_rejected(upstream, limiter):
+    upstream.gate.set()
+    index.RATE_LIMITER.take("127.0.0.1", 9)
+    response = post({"reference": "Alma 1-3", "focus": "no tokens"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 1
@@ -0,0 +1,27 @@
+import pytest
+
+from index import SUMMARY_KINDS
+
+
+@pytest.mark.parametrize("name", sorted(SUMMARY_KINDS))
+def test_schema_is_read_from_the_prompt(name):
+    kind = SUMMARY_KINDS[name]
+    assert kind.schema
+    for field in kind.schema:
+        assert f'"{field}":' in kind.base_prompt
+
+
+def test_validate_coerces_onto_the_schema():
+    kind = SUMMARY_KINDS["scripture"]
+    result = kind.validate({"reference": "Alma 32", "themes": "faith", "overview": 3, "extra": "dropped"})
+    assert set(result) == set(kind.schema)
+    assert result["reference"] == "Alma 32"
+    assert result["themes"] == ["faith"]
+    assert result["overview"] == "3"
+    assert all(result[f] == ([] if t is list else '') for f, t in kind.schema.items()
+               if f not in ("reference", "themes", "overview"))
+
+
+def test_validate_rejects_non_objects():
+    with pytest.raises(ValueError):
+        SUMMARY_KINDS["scripture"].validate(["not", "an", "object"])
@@ -0,0 +1,45 @@
+import pytest
+
+from index import TalkSearchIndex, TalkStore
+
+
+def talk(title, speaker="Speaker"):
+    return {"title": title, "speaker": speaker, "url": "https://example.org/" + title.replace(' ', '-')}
+
+
+def test_extended_leaves_the_previous_index_intact():
+    store = TalkStore()
+    store.append(talk("Faith in Christ"))
+    index = TalkSearchIndex(store)
+    newer = index.extended(store.extended([talk("Enduring faith", "Someone Else")]), 1)
+    assert (index.count, newer.count) == (1, 2)
+    assert index.total_len < newer.total_len
+    assert index.search("faith") == [0]
+    assert sorted(newer.search("faith")) == [0, 1]
+
+
+def test_only_the_newest_index_can_be_extended():
+    store = TalkStore()
+    store.append(talk("Faith in Christ"))
+    index = TalkSearchIndex(store)
+    index.extended(store.extended([talk("Hope")]), 1)
+    with pytest.raises(ValueError):
+        index.extended(store, 1)
+
+
+def test_ingest_rejects_non_text_fields(monkeypatch):
+    import index
+    monkeypatch.setattr(index, "ADMIN_TOKEN", "secret")
+    before = index.talk_data()
+    monkeypatch.setattr(index, "_TALK_DATA", before)
+    client = index.app.test_client()
+    headers = {"Authorization": "Bearer secret"}
+    good = {"title": "New talk", "url": "https://example.org/new-talk"}
+    for bad in ({"tags": ["a"]}, {"title": 5}, {"year": 2024}):
+        response = client.post('/api/admin/talks', json=[good, dict(good, url=good["url"] + "-2", **bad)], headers=headers)
+        assert response.status_code == 400
+        assert "must be a string" in response.json["error"]
+    # Nothing from a rejected request is added, not even its valid talks.
+    assert index.talk_data() is before
+    response = client.post('/api/admin/talks', json=[dict(good, speaker=None)], headers=headers)
+    assert response.json["added"] == 1